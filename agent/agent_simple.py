@@ -29,6 +29,10 @@ class Agent:
         self.api_base_url = api_base_url.rstrip('/')
         self._last_genre_suggestions: list[str] = []
         self._last_genre_wanted: str | None = None
+        # Sinónimo normalizado -> género canónico, desde /genres/vocabulary
+        self._genre_terms: dict[str, str] | None = None
+        # Nombre de lugar normalizado -> código de país o región, desde /countries
+        self._country_terms: dict[str, str] | None = None
     
     def interpret(self, query: str) -> Dict[str, Any]:
         """
@@ -123,7 +127,7 @@ class Agent:
                     # Extraer parámetros específicos del término de búsqueda
                     params = self._extract_search_params(search_term)
                     # Mejora: extraer un año directamente del query completo si no se detectó en el término
-                    if "date" not in params:
+                    if not any(k in params for k in ("date", "year_from", "year_to", "decade")):
                         y = re.search(r"\b(19|20)\d{2}\b", query)
                         if y:
                             params["date"] = y.group(0)
@@ -167,9 +171,26 @@ class Agent:
                 search_term = re.sub(r'\b' + re.escape(author) + r'\b', '', search_term, flags=re.IGNORECASE)
                 break
         
+        # Detectar rangos de años y décadas ("después de 1980", "antes de 1990",
+        # "años 80", "década de 1980"); se envían a la API como year_from,
+        # year_to y decade.
+        year_patterns = [
+            ("year_from", r'\bdespu[eé]s\s+del?\s+(?:a[ñn]o\s+)?((?:19|20)\d{2})\b', 1),
+            ("year_from", r'\bdesde\s+(?:el\s+)?(?:a[ñn]o\s+)?((?:19|20)\d{2})\b', 0),
+            ("year_to", r'\bantes\s+del?\s+(?:a[ñn]o\s+)?((?:19|20)\d{2})\b', -1),
+            ("year_to", r'\bhasta\s+(?:el\s+)?(?:a[ñn]o\s+)?((?:19|20)\d{2})\b', 0),
+            ("decade", r'\b(?:d[eé]cada\s+de(?:\s+los)?|(?:los\s+)?a[ñn]os)\s+((?:19|20)?\d0)\b', 0),
+        ]
+        for key, pattern, offset in year_patterns:
+            range_match = re.search(pattern, search_term)
+            if range_match and key not in params:
+                value = int(range_match.group(1))
+                params[key] = (value + 1900 if value < 100 else value) + offset
+                search_term = search_term.replace(range_match.group(0), '')
+
         # Detectar años
         year_match = re.search(r'\b(19|20)\d{2}\b', search_term)
-        if year_match:
+        if year_match and not any(k in params for k in ("year_from", "year_to", "decade")):
             params["date"] = year_match.group(0)
             search_term = re.sub(r'\b(19|20)\d{2}\b', '', search_term)
         
@@ -178,43 +199,35 @@ class Agent:
             params["type"] = "book"
             search_term = re.sub(r'\b(?:libros?|book)\b', '', search_term)
 
-        # Detectar género aproximado por palabras clave comunes
-        # p.ej., terror, ciencia ficción, romance, crimen, historia, arte
-        genre_map = {
-            "terror": "horror",
-            "ciencia ficcion": "science fiction",
-            "ciencia ficción": "science fiction",
-            "romance": "romance",
-            "crimen": "crime",
-            "policiaca": "crime",
-            "historia": "history",
-            "arte": "art",
-            "fantasia": "fantasy",
-            "fantasía": "fantasy",
-            "misterio": "mystery",
-            "biografia": "biography",
-            "biografía": "biography",
-            "fisica": "physics",
-            "física": "physics",
-        }
-        normalized = (
-            search_term.lower()
-            .replace("ficción", "ficcion")
-            .replace("fantasía", "fantasia")
-            .replace("biografía", "biografia")
-        )
-        for kw, en in genre_map.items():
-            if kw in normalized:
-                params["genre"] = en
+        # Detectar un género del vocabulario controlado de la API (sinónimos en
+        # español e inglés, p.ej. terror, ciencia ficción, crimen); la API
+        # resuelve el sinónimo al género canónico. Se prueba primero el más largo.
+        normalized = self._normalize(search_term)
+        for term in sorted(self._genre_vocabulary(), key=len, reverse=True):
+            pattern = r'\b' + re.escape(term) + r'\b'
+            if re.search(pattern, normalized):
+                params["genre"] = self._genre_vocabulary()[term]
                 # eliminar la palabra clave del término general
-                search_term = re.sub(re.escape(kw), '', normalized, flags=re.IGNORECASE)
+                search_term = re.sub(pattern, '', normalized)
+                break
+
+        # Detectar un país o región del gazetteer de la API ("sobre Colombia",
+        # "de América Latina"); se filtra por su código con country=. Sólo
+        # cuenta tras una preposición de lugar: varios alias son también
+        # palabras comunes o de títulos ("usa", "lima", "Roma", "andes").
+        normalized = self._normalize(search_term)
+        for term in sorted(self._country_places(), key=len, reverse=True):
+            pattern = r'\b(?:sobre|de|del|en|desde)\s+(?:(?:la|el|los|las)\s+)?' + re.escape(term) + r'\b'
+            if re.search(pattern, normalized):
+                params["country"] = self._country_places()[term]
+                search_term = re.sub(pattern, '', normalized)
                 break
         
         # El resto como término general de búsqueda
         search_term = re.sub(r'\s+', ' ', search_term).strip()
         if search_term:
             # Si no hay otros parámetros específicos, usar el término completo
-            if not any(key in params for key in ['author', 'genre', 'type']):
+            if not any(key in params for key in ['author', 'genre', 'type', 'country']):
                 params["q"] = search_term
             elif search_term and not any(word in search_term for word in ['del', 'de', 'la', 'el', 'en', 'los', 'las']):
                 params["q"] = search_term
@@ -228,6 +241,38 @@ class Agent:
         text = ''.join(c for c in text if not unicodedata.combining(c))
         return text.lower().strip()
 
+    def _fetch_terms(self, path: str, terms_key: str, value_key: str) -> dict[str, str] | None:
+        """Arma ``término -> valor`` con la lista de ``terms_key`` de cada entrada de ``path``."""
+        try:
+            r = requests.get(f"{self.api_base_url}{path}", timeout=10)
+            if r.status_code == 200:
+                return {term: entry[value_key] for entry in r.json() for term in entry.get(terms_key, [])}
+        except requests.RequestException:
+            pass
+        return None
+
+    def _genre_vocabulary(self) -> dict[str, str]:
+        """
+        Sinónimos normalizados -> género canónico, leídos una sola vez de
+        /genres/vocabulary. Si la API no responde se reintenta en la próxima consulta.
+        """
+        if self._genre_terms is None:
+            self._genre_terms = self._fetch_terms("/genres/vocabulary", "synonyms", "name")
+        return self._genre_terms or {}
+
+    def _match_genre(self, wanted: str) -> str | None:
+        """
+        Género para ``wanted``: primero el vocabulario controlado (sinónimo o
+        nombre canónico) y, si no está ahí, la aproximación de :meth:`_resolve_genre`.
+        """
+        vocabulary = self._genre_vocabulary()
+        norm_w = self._normalize(wanted)
+        if norm_w in vocabulary:
+            return vocabulary[norm_w]
+        if norm_w in {self._normalize(g) for g in vocabulary.values()}:
+            return wanted
+        return self._resolve_genre(wanted)
+
     def _fetch_genres(self) -> list[str]:
         try:
             r = requests.get(f"{self.api_base_url}/genres", timeout=10)
@@ -264,6 +309,12 @@ class Agent:
         # preparar sugerencias para el usuario
         self._last_genre_suggestions = genres[:10]
         return None
+
+    def _country_places(self) -> dict[str, str]:
+        """Nombres de lugar normalizados -> código de país o región, leídos una sola vez de /countries."""
+        if self._country_terms is None:
+            self._country_terms = self._fetch_terms("/countries", "places", "code")
+        return self._country_terms or {}
     
     def call_api(self, intent: str, params: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -300,28 +351,35 @@ class Agent:
                 q_value: Optional[str] = None
                 if "q" in params and params["q"]:
                     q_value = params["q"]
-                # Si se detectó un año, úsalo como parte de la búsqueda general
-                if "date" in params and params["date"]:
-                    q_value = f"{q_value} {params['date']}".strip() if q_value else params["date"]
                 if q_value:
                     query_params["q"] = q_value
 
+                # Los años se filtran por la columna indexada 'year' de la API
+                if "date" in params and params["date"]:
+                    query_params["year_from"] = params["date"]
+                    query_params["year_to"] = params["date"]
+                for key in ("year_from", "year_to", "decade"):
+                    if params.get(key):
+                        query_params[key] = params[key]
+
                 if "author" in params and params["author"]:
                     query_params["author"] = params["author"]
                 if "type" in params and params["type"]:
                     query_params["type"] = params["type"]
-                if "genre" in params and params["genre"]:
-                    resolved = self._resolve_genre(params["genre"])
-                    if resolved:
-                        # priorizar filtro por género
-                        query_params.pop("q", None)
-                        query_params["genre"] = resolved
-                elif "q" in params and params["q"]:
-                    # Si no venía género pero 'q' podría ser un género, intentar resolverlo
-                    resolved = self._resolve_genre(params["q"])
-                    if resolved:
-                        query_params.pop("q", None)
-                        query_params["genre"] = resolved
+                if params.get("country"):
+                    query_params["country"] = params["country"]
+                self._last_genre_suggestions = []
+                self._last_genre_wanted = None
+                genre = None
+                if params.get("genre"):
+                    genre = self._match_genre(params["genre"])
+                elif params.get("q"):
+                    # Si no venía género pero 'q' podría ser uno, intentar resolverlo
+                    genre = self._match_genre(params["q"])
+                if genre:
+                    # priorizar filtro por género
+                    query_params.pop("q", None)
+                    query_params["genre"] = genre
 
                 # Limitar resultados para mejor experiencia
                 query_params["limit"] = 5
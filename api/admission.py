@@ -0,0 +1,159 @@
+"""
+Control de admisión y descarte de carga para la API.
+
+Cada petición se clasifica en un *carril* (p.ej. ``search`` para ``/items``
+o ``lookup`` para ``/items/{id}``). Cada carril tiene su propio límite de
+concurrencia y una cola de espera acotada. Cuando la cola está llena, o la
+espera supera ``timeout``, la petición se rechaza de inmediato con ``503`` y
+``Retry-After`` en lugar de ocupar un hilo del pool.
+
+Como los carriles no comparten cupos, una ráfaga de búsquedas ``ilike``
+costosas no puede retrasar las consultas por ID: mientras la suma de los
+límites de los carriles pesados quede por debajo del tamaño del pool de
+hilos, siempre hay hilos libres para el carril de consultas puntuales.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+
+@dataclass(frozen=True)
+class LaneConfig:
+    limit: int
+    max_queue: int
+    timeout: float
+
+
+class Lane:
+    """
+    Semáforo con cola acotada y espera con límite de tiempo.
+
+    Sólo se usa desde el hilo del event loop, por lo que no necesita candados.
+    """
+
+    def __init__(self, name: str, config: LaneConfig) -> None:
+        self.name = name
+        self.config = config
+        self.active = 0
+        self._waiters: deque[asyncio.Future] = deque()
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self) -> bool:
+        """Devuelve ``True`` si se obtuvo un cupo, ``False`` si hay que descartar."""
+        if self.active < self.config.limit and not self._waiters:
+            self.active += 1
+            return True
+        if len(self._waiters) >= self.config.max_queue:
+            return False
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, self.config.timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+
+    def release(self) -> None:
+        # Ceder el cupo directamente al siguiente en la cola, si lo hay.
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+
+class AdmissionMiddleware:
+    """
+    Middleware ASGI de admisión por carriles.
+
+    Parameters
+    ----------
+    app : ASGIApp
+        Aplicación envuelta.
+    classify : callable
+        Recibe ``(method, path)`` y devuelve el nombre del carril, o ``None``
+        para no aplicar admisión (p.ej. ``/metrics`` o ``/docs``).
+    lanes : dict
+        Configuración por carril. Los carriles no listados usan ``default``.
+    default : LaneConfig
+        Configuración de los carriles sin entrada en ``lanes``.
+    retry_after : int
+        Segundos sugeridos al cliente en el header ``Retry-After``.
+    on_reject : callable, optional
+        Se invoca con el nombre del carril por cada petición descartada.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        classify: Callable[[str, str], Optional[str]],
+        lanes: dict[str, LaneConfig],
+        default: LaneConfig,
+        retry_after: int = 1,
+        on_reject: Optional[Callable[[str], None]] = None,
+    ) -> None:
+        self.app = app
+        self.classify = classify
+        self.configs = lanes
+        self.default = default
+        self.retry_after = retry_after
+        self.on_reject = on_reject
+        self.lanes: dict[str, Lane] = {}
+
+    def lane(self, name: str) -> Lane:
+        lane = self.lanes.get(name)
+        if lane is None:
+            lane = self.lanes[name] = Lane(name, self.configs.get(name, self.default))
+        return lane
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        name = self.classify(scope["method"], scope["path"]) if scope["type"] == "http" else None
+        if name is None:
+            await self.app(scope, receive, send)
+            return
+        lane = self.lane(name)
+        if not await lane.acquire():
+            if self.on_reject is not None:
+                self.on_reject(name)
+            await self._reject(send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            lane.release()
+
+    async def _reject(self, send: Send) -> None:
+        body = json.dumps({"detail": "Servicio saturado, reintenta más tarde"}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(self.retry_after).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+def parse_limits(spec: str) -> dict[str, int]:
+    """Interpreta ``"search=8,lookup=32"`` como ``{"search": 8, "lookup": 32}``."""
+    limits: dict[str, int] = {}
+    for part in spec.split(","):
+        name, _, value = part.partition("=")
+        if name.strip() and value.strip():
+            limits[name.strip()] = int(value)
+    return limits
@@ -0,0 +1,253 @@
+"""
+Compresión de respuestas HTTP con negociación de contenido.
+
+El middleware elige la mejor codificación que acepte el cliente
+(``Accept-Encoding``) entre las configuradas y disponibles: ``zstd`` y ``br``
+sólo si están instalados los paquetes opcionales ``zstandard`` y ``brotli``;
+``gzip`` siempre está disponible vía ``zlib``.
+
+Las respuestas menores a ``minimum_size`` se envían sin comprimir, al igual
+que las rutas excluidas y los tipos de contenido que no son texto. Las
+respuestas en streaming (p.ej. ``/items/export``) se comprimen por bloques,
+vaciando el compresor en cada bloque para no retrasar el primer byte.
+"""
+from __future__ import annotations
+
+import zlib
+from typing import Callable, Iterable, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Dependencias opcionales: sin ellas sólo se ofrece gzip.
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Orden de preferencia del servidor cuando el cliente acepta varias.
+DEFAULT_ENCODINGS = ("zstd", "br", "gzip")
+
+# Prefijos de ``Content-Type`` que vale la pena comprimir.
+COMPRESSIBLE_TYPES = (
+    "application/json",
+    "application/x-ndjson",
+    "application/javascript",
+    "application/xml",
+    "text/",
+)
+
+
+class _GzipEncoder:
+    def __init__(self, level: int) -> None:
+        # wbits=31 produce el formato gzip (cabecera + CRC) en lugar de zlib.
+        self._obj = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._obj.compress(data)
+
+    def flush(self) -> bytes:
+        return self._obj.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._obj.flush(zlib.Z_FINISH)
+
+
+class _BrotliEncoder:
+    def __init__(self, level: int) -> None:
+        self._obj = brotli.Compressor(quality=level)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._obj.process(data)
+
+    def flush(self) -> bytes:
+        return self._obj.flush()
+
+    def finish(self) -> bytes:
+        return self._obj.finish()
+
+
+class _ZstdEncoder:
+    def __init__(self, level: int) -> None:
+        self._obj = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._obj.compress(data)
+
+    def flush(self) -> bytes:
+        return self._obj.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self) -> bytes:
+        return self._obj.flush()
+
+
+def available_encodings() -> dict[str, Callable[[int], object]]:
+    """Devuelve las codificaciones soportadas en este entorno."""
+    encoders: dict[str, Callable[[int], object]] = {"gzip": _GzipEncoder}
+    if brotli is not None:
+        encoders["br"] = _BrotliEncoder
+    if zstandard is not None:
+        encoders["zstd"] = _ZstdEncoder
+    return encoders
+
+
+def compress(data: bytes, encoding: str, level: int) -> bytes:
+    """Comprime ``data`` de una vez con la codificación indicada."""
+    encoder = available_encodings()[encoding](level)
+    return encoder.compress(data) + encoder.finish()
+
+
+def negotiate(accept_encoding: str, offered: Iterable[str]) -> Optional[str]:
+    """
+    Elige la codificación a usar según ``Accept-Encoding``.
+
+    Respeta los valores ``q`` (``q=0`` excluye una codificación) y el comodín
+    ``*``. Ante empate gana el orden de ``offered``.
+    """
+    weights: dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        token, _, params = part.strip().partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        weights[token] = q
+    best: Optional[str] = None
+    best_q = 0.0
+    for encoding in offered:
+        q = weights.get(encoding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+class CompressionMiddleware:
+    """
+    Middleware ASGI que comprime respuestas con gzip, brotli o zstd.
+
+    Parameters
+    ----------
+    app : ASGIApp
+        Aplicación envuelta.
+    minimum_size : int
+        Tamaño mínimo en bytes de un cuerpo completo para comprimirlo.
+    encodings : iterable of str, optional
+        Codificaciones permitidas en orden de preferencia; las que no estén
+        instaladas se ignoran.
+    exclude_paths : iterable of str
+        Prefijos de ruta que nunca se comprimen.
+    levels : dict, optional
+        Nivel por codificación, p.ej. ``{"gzip": 6, "br": 4, "zstd": 3}``.
+    """
+
+    DEFAULT_LEVELS = {"gzip": 6, "br": 4, "zstd": 3}
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 500,
+        encodings: Optional[Iterable[str]] = None,
+        exclude_paths: Iterable[str] = (),
+        levels: Optional[dict[str, int]] = None,
+    ) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        supported = available_encodings()
+        self.encoders = {
+            name: supported[name]
+            for name in (encodings or DEFAULT_ENCODINGS)
+            if name in supported
+        }
+        self.exclude_paths = tuple(p for p in exclude_paths if p)
+        self.levels = {**self.DEFAULT_LEVELS, **(levels or {})}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or self._excluded(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+        headers = Headers(scope=scope)
+        encoding = negotiate(headers.get("accept-encoding", ""), self.encoders)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        responder = _CompressingResponder(
+            send, encoding, self.encoders[encoding], self.levels[encoding], self.minimum_size
+        )
+        await self.app(scope, receive, responder.send)
+
+    def _excluded(self, path: str) -> bool:
+        return any(path.startswith(prefix) for prefix in self.exclude_paths)
+
+
+class _CompressingResponder:
+    """Intercepta los mensajes de respuesta y comprime el cuerpo si procede."""
+
+    def __init__(self, send: Send, encoding: str, factory, level: int, minimum_size: int) -> None:
+        self._send = send
+        self.encoding = encoding
+        self.factory = factory
+        self.level = level
+        self.encoder = None
+        self.minimum_size = minimum_size
+        self.initial_message: Message = {}
+        self.started = False
+        self.passthrough = False
+
+    async def send(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            # Retener la cabecera hasta ver el primer bloque del cuerpo.
+            self.initial_message = message
+            headers = Headers(raw=message["headers"])
+            content_type = headers.get("content-type", "")
+            self.passthrough = (
+                "content-encoding" in headers
+                or not content_type.startswith(COMPRESSIBLE_TYPES)
+            )
+            return
+        if message["type"] != "http.response.body":
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if not self.started:
+            self.started = True
+            if self.passthrough or (not more_body and len(body) < self.minimum_size):
+                self.passthrough = True
+                await self._send(self.initial_message)
+                await self._send(message)
+                return
+            # El compresor (p.ej. el estado de zlib) sólo se crea si se usa.
+            self.encoder = self.factory(self.level)
+            headers = MutableHeaders(raw=self.initial_message["headers"])
+            headers["Content-Encoding"] = self.encoding
+            headers.add_vary_header("Accept-Encoding")
+            if more_body:
+                del headers["Content-Length"]
+                message["body"] = self.encoder.compress(body) + self.encoder.flush()
+            else:
+                message["body"] = self.encoder.compress(body) + self.encoder.finish()
+                headers["Content-Length"] = str(len(message["body"]))
+            await self._send(self.initial_message)
+            await self._send(message)
+            return
+
+        if self.passthrough:
+            await self._send(message)
+            return
+        chunk = self.encoder.compress(body)
+        chunk += self.encoder.flush() if more_body else self.encoder.finish()
+        message["body"] = chunk
+        await self._send(message)
@@ -7,18 +7,52 @@ ejecutando nuevamente el proceso ETL.
 """
 from __future__ import annotations
 
+import asyncio
+import csv
+import io
+import json
+import logging
 import os
-from typing import Optional, List
+import re
+import contextvars
+import heapq
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, asynccontextmanager, contextmanager
+from itertools import islice
+from dataclasses import asdict, dataclass
+from typing import Annotated, Any, AsyncIterator, Callable, Literal, Optional, List, Iterator, Set, Union
 
-from fastapi import FastAPI, Depends, HTTPException, Header, Query, status
-from sqlalchemy import create_engine, select, or_
+import anyio.to_thread
+from fastapi import FastAPI, Depends, HTTPException, Header, Query, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from sqlalchemy import create_engine, event, select, or_, func, column, literal_column, table, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.orm import Session
 from typing import Generator
 
-from models_shared import Base, Item
-from etl.load import run as etl_run  # reuse the ETL to refresh data
+from models_shared import (
+    Base, DatasetStats, Genre, GenreSynonym, Item, ItemChange, ItemCountry, ItemGenre, ItemSimilarity, Place,
+)
+from api.cache import BloomFilter, LRUCache, SingleFlight
+from api.admission import AdmissionMiddleware, LaneConfig, parse_limits
+from api.compression import CompressionMiddleware
+from api.metrics import MetricsMiddleware, instrument_engine, registry as metrics_registry
+from api import slowlog
+from api.memstore import ColumnarStore
+from api.suggest import PrefixIndex, split_values
+from api.warmup import QueryLog, QueryLogMiddleware, replay
+from etl.shards import shard_count, shard_index, shard_urls
+from etl.snapshot import current_snapshot, publish_snapshot, snapshot_url
+from etl.gazetteer import PLACE_NAMES
+from etl.vocabulary import GENRE_NAMES, normalize_term
+
+from pydantic import BaseModel, Field, ValidationError
 
-from pydantic import BaseModel
+logger = logging.getLogger(__name__)
 
 class ItemOut(BaseModel):
     id: str
@@ -30,29 +64,779 @@ class ItemOut(BaseModel):
     summary: Optional[str] = None
     source_url: Optional[str] = None
     genre: Optional[str] = None
+    year: Optional[int] = None
 
     class Config:
         from_attributes = True
 
+class SimilarItemOut(ItemOut):
+    score: float
+
 class GenreOut(BaseModel):
     name: str
     count: int
 
+class CountryOut(BaseModel):
+    code: str
+    name: str
+    count: int
+    places: List[str]
+
+class GenreVocabularyOut(BaseModel):
+    id: int
+    name: str
+    synonyms: List[str]
+
+class FacetValue(BaseModel):
+    value: str
+    count: int
+
+# Facetas disponibles en ``/items/facets``. Las columnas multivalor guardan
+# listas separadas por comas y se cuentan por cada valor individual; ``genre``
+# y ``country`` se cuentan sobre sus tablas asociadas (``item_genres`` e
+# ``item_countries``), con un valor canónico por fila.
+FACETS = ("author", "type", "location", "genre", "decade", "country")
+MULTIVALUED_FACETS = {"author", "location", "genre"}
+
+# Campos con autocompletado en ``/suggest``.
+SUGGEST_FIELDS = ("title", "author", "genre")
+
+# Máximo de ids aceptados por ``POST /items/batch`` y tamaño de cada
+# consulta ``IN`` (SQLite limita a 999 variables por sentencia).
+BATCH_MAX_IDS = 5000
+BATCH_CHUNK_SIZE = 500
+
+# Filas que se leen del cursor por cada lote en ``/items/export``.
+EXPORT_BATCH_SIZE = 1000
+
+class ItemBatchIn(BaseModel):
+    ids: List[str] = Field(..., min_length=1, max_length=BATCH_MAX_IDS)
+
+class ItemBatchOut(BaseModel):
+    items: List[ItemOut]
+    missing: List[str]
+
+class ItemIn(BaseModel):
+    """Registro aceptado por ``POST /admin/items`` (una línea NDJSON)."""
+    id: str = Field(..., min_length=1)
+    title: str = Field(..., min_length=1)
+    date: Optional[str] = None
+    author: Optional[str] = None
+    location: Optional[str] = None
+    type: Optional[str] = None
+    summary: Optional[str] = None
+    source_url: Optional[str] = None
+    genre: Optional[str] = None
+    year: Optional[int] = None
+
+class IngestError(BaseModel):
+    line: int
+    error: str
+
+class IngestBatchOut(BaseModel):
+    batch: int
+    received: int
+    upserted: int
+    rejected: int
+    errors: List[IngestError]
+
+class IngestOut(BaseModel):
+    received: int
+    upserted: int
+    rejected: int
+    version: int
+    batches: List[IngestBatchOut]
+
+class ItemsSubQuery(BaseModel):
+    """Sub-consulta equivalente a ``GET /items`` (mismos filtros y paginación)."""
+    kind: Literal["items"]
+    q: Optional[str] = None
+    author: Optional[str] = None
+    type: Optional[str] = None
+    genre: Optional[str] = None
+    location: Optional[str] = None
+    country: Optional[str] = None
+    year_from: Optional[int] = Field(None, ge=0, le=9999)
+    year_to: Optional[int] = Field(None, ge=0, le=9999)
+    decade: Optional[int] = Field(None, ge=0, le=9999)
+    limit: int = Field(20, ge=1, le=100)
+    offset: int = Field(0, ge=0)
+    fields: Optional[str] = None
+    sort: Optional[str] = Field(None, pattern="^relevance$")
+
+class GenresSubQuery(BaseModel):
+    """Sub-consulta equivalente a ``GET /genres``."""
+    kind: Literal["genres"]
+    top: int = Field(200, ge=1, le=200)
+
+class ItemIdsSubQuery(BaseModel):
+    """Sub-consulta equivalente a ``POST /items/batch``."""
+    kind: Literal["item_ids"]
+    ids: List[str] = Field(..., min_length=1, max_length=BATCH_MAX_IDS)
+
+SubQuery = Annotated[Union[ItemsSubQuery, GenresSubQuery, ItemIdsSubQuery], Field(discriminator="kind")]
+
+# Sub-consultas admitidas por ``POST /query/batch``.
+QUERY_BATCH_MAX = 20
+
+class QueryBatchIn(BaseModel):
+    queries: dict[str, SubQuery] = Field(..., min_length=1, max_length=QUERY_BATCH_MAX)
+
+class SubQueryResult(BaseModel):
+    status: int
+    data: Optional[Any] = None
+    error: Optional[Any] = None
+
+class QueryBatchOut(BaseModel):
+    results: dict[str, SubQueryResult]
+
+# Ingesta NDJSON: líneas validadas y cargadas por lote, tamaño máximo de una
+# línea y errores detallados que se reportan por lote.
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "1000"))
+INGEST_MAX_LINE_BYTES = 1024 * 1024
+INGEST_MAX_ERRORS_PER_BATCH = 20
+
+# Columnas del modelo ``Item`` que pueden pedirse vía ``fields=``.
+ITEM_FIELDS: tuple[str, ...] = tuple(Item.__table__.columns.keys())
+
 DB_URL = os.getenv("DB_URL", "sqlite:///./data.db")
 API_KEY = os.getenv("API_KEY", "dev-key")
 
-# Crear el engine una vez al importar el módulo. Con SQLite esto creará
-# el archivo de base de datos en el directorio de trabajo si no existe.
-engine = create_engine(DB_URL, future=True)
+# Conteos totales: por encima de este número de filas, una consulta sin
+# filtros usa el conteo de ``dataset_stats`` en vez de ``COUNT(*)``.
+COUNT_ESTIMATE_THRESHOLD = int(os.getenv("COUNT_ESTIMATE_THRESHOLD", "100000"))
+count_cache = LRUCache(maxsize=int(os.getenv("COUNT_CACHE_SIZE", "4096")))
+
+# Consultas por ID: caché de ítems calientes (JSON ya serializado por
+# ``(versión, id)``, compartida con ``/items/batch``) y filtro de Bloom de los
+# ids existentes, que responde los 404 sin consultar la base de datos.
+item_cache = LRUCache(maxsize=int(os.getenv("ITEM_CACHE_SIZE", "10000")))
+BLOOM_ERROR_RATE = float(os.getenv("BLOOM_ERROR_RATE", "0.01"))
+# Consultas idénticas en curso (listados, géneros, facetas) comparten una sola
+# ejecución; ver :func:`coalesced`.
+single_flight = SingleFlight()
+
+# Bitácora de consultas lentas: umbral en milisegundos (negativo la desactiva)
+# y si se captura ``EXPLAIN QUERY PLAN`` para cada una.
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "100"))
+SLOW_QUERY_EXPLAIN = os.getenv("SLOW_QUERY_EXPLAIN", "1") not in {"0", "false", "no"}
+slow_query_log = slowlog.SlowQueryLog(threshold_ms=SLOW_QUERY_MS, explain=SLOW_QUERY_EXPLAIN)
+
+# ``SERVING_MODE=memory`` sirve ``/items`` desde una copia columnar en memoria
+# (ver ``api.memstore``); ``database`` (por defecto) consulta SQLite.
+SERVING_MODE = os.getenv("SERVING_MODE", "database")
+# Cada cuántos segundos se revisa si otro proceso publicó una nueva versión
+# del dataset (0 desactiva la revisión).
+DATASET_POLL_SECONDS = float(os.getenv("DATASET_POLL_SECONDS", "5"))
+
+# Compresión de respuestas: tamaño mínimo en bytes, codificaciones permitidas
+# en orden de preferencia y prefijos de ruta excluidos (separados por comas).
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "500"))
+COMPRESSION_ENCODINGS = os.getenv("COMPRESSION_ENCODINGS", "zstd,br,gzip").split(",")
+COMPRESSION_EXCLUDE_PATHS = os.getenv("COMPRESSION_EXCLUDE_PATHS", "").split(",")
+
+# Control de admisión (ver ``api.admission``): concurrencia máxima por carril,
+# peticiones en espera por carril, segundos de espera antes de responder 503
+# y valor del header ``Retry-After``. ``ADMISSION_ENABLED=0`` lo desactiva.
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "1") not in {"0", "false", "no"}
+ADMISSION_LIMITS = parse_limits(
+    os.getenv("ADMISSION_LIMITS", "search=8,export=2,facets=4,batch=4,genres=4,lookup=16")
+)
+ADMISSION_QUEUE = int(os.getenv("ADMISSION_QUEUE", "32"))
+ADMISSION_TIMEOUT = float(os.getenv("ADMISSION_TIMEOUT", "2"))
+ADMISSION_RETRY_AFTER = int(os.getenv("ADMISSION_RETRY_AFTER", "1"))
+# Hilos del pool donde corren los endpoints síncronos (0 conserva el valor
+# por defecto de anyio, 40). Debe superar la suma de los carriles pesados
+# para que las consultas por ID siempre encuentren un hilo libre.
+THREADPOOL_SIZE = int(os.getenv("THREADPOOL_SIZE", "0"))
+
+# Modo snapshot (ver ``etl.snapshot``): si ``SNAPSHOT_DIR`` está definido, las
+# lecturas usan el snapshot publicado en sólo lectura e inmutable, con un
+# ``mmap_size`` grande para compartir la caché de páginas entre procesos. Las
+# escrituras (``/admin/items``) siguen yendo a ``DB_URL``.
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR") or None
+SNAPSHOT_MMAP_BYTES = int(os.getenv("SNAPSHOT_MMAP_BYTES", str(1 << 30)))
+
+# Calentamiento (ver ``api.warmup``): cuántas de las consultas más frecuentes
+# se repiten tras el arranque y cada cambio del dataset (0 lo desactiva) y
+# archivo JSON opcional donde se conservan sus frecuencias entre despliegues.
+WARMUP_TOP = int(os.getenv("WARMUP_TOP", "50"))
+WARMUP_LOG_PATH = os.getenv("WARMUP_LOG_PATH") or None
+query_log = QueryLog()
+
+# El engine se crea en el primer uso (normalmente al arrancar, desde el
+# ``lifespan``) y no al importar el módulo. Con SQLite esto creará el archivo
+# de base de datos en el directorio de trabajo si no existe.
+_engine: Optional[Engine] = None
+_engine_lock = threading.Lock()
+
+def _create_engine(url: str) -> Engine:
+    engine = create_engine(url, future=True)
+    instrument_engine(engine)
+    slowlog.instrument_engine(engine, slow_query_log)
+    return engine
+
+def _create_snapshot_engine(path: str) -> Engine:
+    engine = _create_engine(snapshot_url(path))
+
+    @event.listens_for(engine, "connect")
+    def _set_mmap(dbapi_connection, connection_record) -> None:
+        dbapi_connection.execute(f"PRAGMA mmap_size={SNAPSHOT_MMAP_BYTES}")
+
+    return engine
+
+# Snapshot abierto por ``_engine`` y engine de escritura del modo snapshot.
+_snapshot_path: Optional[str] = None
+_write_engine: Optional[Engine] = None
+
+def get_engine() -> Engine:
+    """Devuelve el engine compartido, creándolo e instrumentándolo la primera vez."""
+    global _engine, _snapshot_path
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                path = current_snapshot(SNAPSHOT_DIR) if SNAPSHOT_DIR else None
+                _engine = _create_snapshot_engine(path) if path else _create_engine(DB_URL)
+                _snapshot_path = path
+    return _engine
+
+def get_write_engine() -> Engine:
+    """Engine de escritura sobre ``DB_URL``; igual a :func:`get_engine` sin snapshots."""
+    global _write_engine
+    if not SNAPSHOT_DIR:
+        return get_engine()
+    if _write_engine is None:
+        with _engine_lock:
+            if _write_engine is None:
+                _write_engine = _create_engine(DB_URL)
+    return _write_engine
+
+def reload_snapshot() -> bool:
+    """
+    Reabre el snapshot vigente si el puntero de ``SNAPSHOT_DIR`` cambió.
+
+    Las consultas en curso terminan con el engine anterior; las nuevas usan el
+    snapshot recién publicado. Devuelve ``True`` si hubo cambio.
+    """
+    global _engine, _snapshot_path
+    if not SNAPSHOT_DIR:
+        return False
+    path = current_snapshot(SNAPSHOT_DIR)
+    if path is None or path == _snapshot_path:
+        return False
+    with _engine_lock:
+        old, _engine, _snapshot_path = _engine, _create_snapshot_engine(path), path
+    if old is not None:
+        old.dispose()
+    logger.info("Snapshot abierto: %s", path)
+    return True
+
+# Particionado opcional de ``items`` en varios archivos (ver ``etl.shards``).
+# La base de ``DB_URL`` conserva las tablas globales (``dataset_stats``,
+# ``item_similarity``); las consultas a ``items`` se reparten entre los shards
+# y sus resultados se combinan (scatter-gather).
+SHARD_URLS: List[str] = shard_urls(DB_URL) if shard_count() > 1 else []
+_shard_engines: Optional[List[Engine]] = None
+_shard_pool = ThreadPoolExecutor(max_workers=len(SHARD_URLS), thread_name_prefix="shard") if SHARD_URLS else None
+
+def get_shard_engines() -> List[Engine]:
+    """Engines de los shards, creados en el primer uso; lista vacía sin shards."""
+    global _shard_engines
+    if _shard_engines is None:
+        with _engine_lock:
+            if _shard_engines is None:
+                _shard_engines = [_create_engine(url) for url in SHARD_URLS]
+    return _shard_engines
+
+@contextmanager
+def item_sessions(session: Session) -> Iterator[List[Session]]:
+    """
+    Sesiones sobre las que se reparte una consulta a ``items``: la de la
+    petición si no hay shards, o una por shard (en orden de shard).
+    """
+    engines = get_shard_engines()
+    if not engines:
+        yield [session]
+        return
+    with ExitStack() as stack:
+        yield [stack.enter_context(Session(engine)) for engine in engines]
+
+def scatter(func: Callable[[Session], Any], sessions: List[Session]) -> list:
+    """Ejecuta ``func`` en cada sesión, en paralelo cuando hay varios shards."""
+    if len(sessions) == 1:
+        return [func(sessions[0])]
+    # Cada tarea corre con una copia del contexto para que las métricas de
+    # SQL se atribuyan a la petición en curso.
+    futures = [_shard_pool.submit(contextvars.copy_context().run, func, s) for s in sessions]
+    return [f.result() for f in futures]
+
+def scan_items(*columns) -> Iterator:
+    """
+    Recorre ``columns`` de toda la tabla ``items`` en lotes, como mapeos:
+    ordenados por ``id`` si ``id`` está entre las columnas (con shards, con
+    una mezcla ordenada) y si no en orden de tabla.
+    """
+    def stream(engine, ordered: bool) -> Iterator:
+        stmt = select(*columns)
+        stmt = stmt.order_by(Item.id if ordered else literal_column("items.rowid"))
+        with Session(engine) as session:
+            yield from session.execute(stmt.execution_options(yield_per=EXPORT_BATCH_SIZE)).mappings()
+
+    by_id = any(c is Item.id for c in columns)
+    engines = get_shard_engines()
+    if not engines:
+        yield from stream(get_engine(), by_id)
+        return
+    streams = [stream(engine, by_id) for engine in engines]
+    if by_id:
+        yield from heapq.merge(*streams, key=lambda row: row["id"])
+    else:
+        for rows in streams:
+            yield from rows
+
+def count_items(session: Session) -> int:
+    """Número de filas de ``items`` sumando todos los shards."""
+    with item_sessions(session) as sessions:
+        return sum(scatter(lambda s: s.scalar(select(func.count()).select_from(Item)) or 0, sessions))
+
+def verify_api_key(x_api_key: Optional[str] = Header(None, alias="X-API-KEY")) -> None:
+    """Dependencia que exige el header ``X-API-KEY`` en endpoints administrativos."""
+    if x_api_key != API_KEY:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Clave API inválida")
 
 def get_session() -> Generator[Session, None, None]:
     """
     Dependencia que proporciona una sesión de base de datos para una petición.
     La sesión se cierra después de enviar la respuesta.
     """
-    with Session(engine) as session:
+    with Session(get_engine()) as session:
         yield session
 
+def parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    """
+    Valida el parámetro ``fields`` (lista separada por comas) contra las
+    columnas del modelo ``Item``.
+
+    Devuelve ``None`` cuando no se pidió una proyección. El ``id`` se incluye
+    siempre para que cada ítem siga siendo direccionable.
+    """
+    if not fields:
+        return None
+    requested = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in requested if f not in ITEM_FIELDS]
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=(
+                f"Campos desconocidos: {', '.join(unknown)}. "
+                f"Campos permitidos: {', '.join(ITEM_FIELDS)}"
+            ),
+        )
+    return ["id"] + [f for f in dict.fromkeys(requested) if f != "id"]
+
+# Índice FTS5 creado por el ETL (ver ``etl.load.ensure_search_index``) y pesos
+# BM25 de sus columnas: title, author, summary, genre, location. ``location``
+# está indexada para que ``q`` encuentre lo mismo con y sin ``sort=relevance``.
+items_fts = table("items_fts", column("rowid"))
+SEARCH_WEIGHTS = (10.0, 5.0, 1.0, 3.0, 2.0)
+relevance_order = literal_column(f"bm25(items_fts, {', '.join(map(str, SEARCH_WEIGHTS))})")
+
+def item_order(relevance: bool) -> tuple:
+    """
+    Orden canónico de las páginas de ``/items``: por ``id`` (por BM25 y luego
+    ``id`` con ``sort=relevance``). Es el mismo con una base, con shards y en
+    el almacén en memoria, así que ``limit``/``offset`` no dependen del modo.
+    """
+    return (relevance_order, Item.id) if relevance else (Item.id,)
+
+def fts_query(q: str) -> Optional[str]:
+    """
+    Convierte ``q`` en una consulta FTS5: cada palabra se busca como prefijo
+    y se combinan con ``OR`` para que BM25 ordene por cuántas coinciden.
+    """
+    tokens = re.findall(r"\w+", q)
+    if not tokens:
+        return None
+    return " OR ".join(f'"{token}"*' for token in tokens)
+
+def search_index_available(session: Session) -> bool:
+    """Indica si la base de datos tiene el índice ``items_fts``."""
+    return session.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'items_fts'")
+    ).first() is not None
+
+def use_relevance(session: Session, q: Optional[str], sort: Optional[str]) -> bool:
+    """
+    Indica si la consulta se ordena por BM25: requiere ``sort=relevance``, un
+    ``q`` con alguna palabra (uno sólo de signos no produce ``MATCH`` y se
+    resuelve con ``ilike``, sin unir ``items_fts``) y el índice creado.
+    """
+    return bool(sort == "relevance" and q and fts_query(q) and search_index_available(session))
+
+@dataclass(frozen=True)
+class ItemFilters:
+    """Filtros comunes de ``/items`` y de los endpoints que lo derivan."""
+    q: Optional[str] = None
+    author: Optional[str] = None
+    type: Optional[str] = None
+    genre: Optional[str] = None
+    location: Optional[str] = None
+    year_from: Optional[int] = None
+    year_to: Optional[int] = None
+    decade: Optional[int] = None
+    # Código de país o región ya resuelto (ver :func:`resolve_country`).
+    country: Optional[str] = None
+
+    def key(self, **extra) -> tuple:
+        """Normaliza los filtros (y ``extra``) en una clave hashable y estable."""
+        values = {**asdict(self), **extra}
+        return tuple(sorted(
+            (name, value.strip() if isinstance(value, str) else value)
+            for name, value in values.items()
+            if value is not None and (not isinstance(value, str) or value.strip())
+        ))
+
+    def year_range(self) -> tuple[Optional[int], Optional[int]]:
+        """Combina ``year_from``, ``year_to`` y ``decade`` en un rango inclusivo."""
+        low, high = self.year_from, self.year_to
+        if self.decade is not None:
+            start = self.decade - self.decade % 10
+            low = start if low is None else max(low, start)
+            high = start + 9 if high is None else min(high, start + 9)
+        return low, high
+
+def item_filters(
+    q: Optional[str] = Query(None, description="Término de búsqueda para el título"),
+    author: Optional[str] = Query(None, description="Filtrar por nombre de autor"),
+    type: Optional[str] = Query(None, description="Filtrar por tipo/categoría"),
+    genre: Optional[str] = Query(None, description="Filtrar por género/tema"),
+    location: Optional[str] = Query(None, description="Filtrar por ubicación"),
+    year_from: Optional[int] = Query(None, ge=0, le=9999, description="Año de publicación mínimo (inclusive)"),
+    year_to: Optional[int] = Query(None, ge=0, le=9999, description="Año de publicación máximo (inclusive)"),
+    decade: Optional[int] = Query(None, ge=0, le=9999, description="Década de publicación, p.ej. ``1980``"),
+    country: Optional[str] = Query(
+        None, description="País o región: código (``CO``, ``419``) o nombre (``Colombia``, ``América Latina``)"
+    ),
+) -> ItemFilters:
+    """Dependencia que agrupa los filtros de ``/items``."""
+    return ItemFilters(
+        q, author, type, genre, location, year_from, year_to, decade,
+        resolve_country(country) if country else None,
+    )
+
+def apply_filters(stmt, filters: ItemFilters, relevance: bool = False):
+    """
+    Aplica los filtros comunes de ``/items`` a una sentencia ``select``.
+
+    Con ``relevance`` el término ``q`` se resuelve contra el índice de texto
+    completo en lugar de ``ilike``, y la sentencia puede ordenarse con
+    ``relevance_order``. Los filtros de año son rangos sobre la columna
+    indexada ``year``. Un ``genre`` que es sinónimo del vocabulario
+    controlado se resuelve al género canónico (ver :func:`resolve_genre`) y
+    ``country`` es una búsqueda exacta en el índice de ``item_countries``.
+    """
+    q = filters.q
+    match = fts_query(q) if q and relevance else None
+    if match:
+        stmt = stmt.join_from(Item, items_fts, items_fts.c.rowid == literal_column("items.rowid"))
+        stmt = stmt.where(text("items_fts MATCH :fts_match").bindparams(fts_match=match))
+    elif q:
+        # Buscar en título o ubicación
+        stmt = stmt.where(
+            or_(
+                Item.title.ilike(f"%{q}%"),
+                Item.location.ilike(f"%{q}%")
+            )
+        )
+    if filters.author:
+        stmt = stmt.where(Item.author.ilike(f"%{filters.author}%"))
+    if filters.type:
+        stmt = stmt.where(Item.type == filters.type)
+    if filters.location:
+        stmt = stmt.where(Item.location.ilike(f"%{filters.location}%"))
+    if filters.genre:
+        # Un sinónimo del vocabulario se filtra por el índice de ``item_genres``;
+        # cualquier otro tema, por subcadena como antes.
+        genre_id = resolve_genre(filters.genre)
+        if genre_id is not None:
+            stmt = stmt.where(Item.id.in_(select(ItemGenre.item_id).where(ItemGenre.genre_id == genre_id)))
+        else:
+            stmt = stmt.where(Item.genre.ilike(f"%{filters.genre}%"))
+    if filters.country:
+        stmt = stmt.where(Item.id.in_(select(ItemCountry.item_id).where(ItemCountry.code == filters.country)))
+    year_low, year_high = filters.year_range()
+    if year_low is not None:
+        stmt = stmt.where(Item.year >= year_low)
+    if year_high is not None:
+        stmt = stmt.where(Item.year <= year_high)
+    return stmt
+
+def _cache_item(version: Optional[int], item: ItemOut) -> bytes:
+    body = item.model_dump_json().encode()
+    item_cache.set((version, item.id), body)
+    return body
+
+def lookup_items_json(session: Session, ids: List[str]) -> dict[str, bytes]:
+    """
+    Resuelve varios ids y devuelve ``id -> JSON de ItemOut`` sólo con los
+    encontrados. Es el camino común de ``GET /items/{id}`` y ``POST /items/batch``.
+
+    Los ids que el filtro de Bloom descarta no se consultan y los que están en
+    ``item_cache`` no generan SQL ni objetos ORM; el resto se busca con
+    consultas ``IN`` por bloques de ``BATCH_CHUNK_SIZE``.
+    """
+    found: dict[str, bytes] = {}
+    version = _seen_dataset_version
+    bloom = known_ids
+    pending: List[str] = []
+    for item_id in dict.fromkeys(ids):
+        if bloom is not None and item_id not in bloom:
+            continue
+        body = item_cache.get((version, item_id))
+        if body is not None:
+            found[item_id] = body
+        else:
+            pending.append(item_id)
+    store = memory_store
+    if store is not None:
+        for item_id in pending:
+            row = store.get(item_id)
+            if row is not None:
+                found[item_id] = _cache_item(version, ItemOut(**row))
+        return found
+    with item_sessions(session) as sessions:
+        # Cada id se busca sólo en su shard.
+        by_shard: dict[int, List[str]] = {}
+        for item_id in pending:
+            by_shard.setdefault(shard_index(item_id, len(sessions)), []).append(item_id)
+        for index, shard_ids in by_shard.items():
+            for start in range(0, len(shard_ids), BATCH_CHUNK_SIZE):
+                chunk = shard_ids[start:start + BATCH_CHUNK_SIZE]
+                for obj in sessions[index].scalars(select(Item).where(Item.id.in_(chunk))):
+                    found[obj.id] = _cache_item(version, ItemOut.from_orm(obj))
+    return found
+
+def get_dataset_stats(session: Session) -> Optional[DatasetStats]:
+    """
+    Devuelve las estadísticas mantenidas por el ETL, o ``None`` si la base de
+    datos aún no tiene la tabla ``dataset_stats``.
+    """
+    try:
+        return session.get(DatasetStats, 1)
+    except OperationalError:
+        return None
+
+def total_count(session: Session, key: tuple, stmt_filter) -> tuple[int, bool]:
+    """
+    Cuenta las filas que cumplen los filtros. Devuelve ``(total, exacto)``.
+
+    Los conteos exactos se guardan en caché por filtro normalizado y versión
+    del dataset. Sin filtros, y si el catálogo supera
+    ``COUNT_ESTIMATE_THRESHOLD``, se usa el conteo de ``dataset_stats``
+    calculado por el ETL en lugar de recorrer la tabla.
+    """
+    stats = get_dataset_stats(session)
+    if not key and stats is not None and stats.item_count >= COUNT_ESTIMATE_THRESHOLD:
+        return stats.item_count, False
+    cache_key = (stats.version if stats else 0, key)
+    total = count_cache.get(cache_key)
+    if total is None:
+        with item_sessions(session) as sessions:
+            total = sum(scatter(
+                lambda s: s.scalar(stmt_filter(select(func.count()).select_from(Item))) or 0, sessions
+            ))
+        count_cache.set(cache_key, total)
+    return total, True
+
+def count_headers(total: int, exact: bool) -> dict[str, str]:
+    return {"X-Total-Count": str(total), "X-Total-Count-Exact": "true" if exact else "false"}
+
+# Funciones a ejecutar cuando cambia el dataset: al arrancar, después de
+# ``/admin/refresh`` y cuando la revisión periódica detecta una nueva versión.
+_dataset_listeners: List[Callable[[], None]] = []
+_seen_dataset_version: Optional[int] = None
+
+def on_dataset_change(func: Callable[[], None]) -> Callable[[], None]:
+    """Decorador que registra ``func`` para reconstruir estado derivado del dataset."""
+    _dataset_listeners.append(func)
+    return func
+
+def current_dataset_version() -> int:
+    with Session(get_engine()) as session:
+        stats = get_dataset_stats(session)
+        return stats.version if stats else 0
+
+def notify_dataset_changed() -> None:
+    """Ejecuta los listeners registrados con :func:`on_dataset_change`."""
+    global _seen_dataset_version
+    _seen_dataset_version = current_dataset_version()
+    for listener in _dataset_listeners:
+        try:
+            listener()
+        except Exception:
+            logger.exception("Error al reconstruir %s", listener.__name__)
+
+def _watch_dataset_version(stop: threading.Event) -> None:
+    while not stop.wait(DATASET_POLL_SECONDS):
+        try:
+            reload_snapshot()
+            if current_dataset_version() != _seen_dataset_version:
+                logger.info("Nueva versión del dataset detectada")
+                notify_dataset_changed()
+        except Exception:
+            logger.exception("Error al revisar la versión del dataset")
+
+# Vocabulario de géneros (``genre_synonyms``): sinónimo normalizado -> id del
+# género. Vacío si la base aún no lo tiene; entonces ``genre=`` usa ``ilike``.
+genre_synonyms: dict[str, int] = {}
+
+@on_dataset_change
+def reload_genre_vocabulary() -> None:
+    """Carga la tabla de sinónimos de géneros."""
+    global genre_synonyms
+    with Session(get_engine()) as session:
+        try:
+            genre_synonyms = dict(session.execute(select(GenreSynonym.term, GenreSynonym.genre_id)).all())
+        except OperationalError:
+            genre_synonyms = {}
+
+def resolve_genre(term: str) -> Optional[int]:
+    """Id del género canónico de ``term`` (cualquier sinónimo, sin tildes), o ``None``."""
+    return genre_synonyms.get(normalize_term(term))
+
+# Gazetteer (``places``): nombre de lugar normalizado -> código de país o región.
+place_codes: dict[str, str] = {}
+
+@on_dataset_change
+def reload_place_codes() -> None:
+    """Carga la tabla de lugares del gazetteer."""
+    global place_codes
+    with Session(get_engine()) as session:
+        try:
+            place_codes = dict(session.execute(select(Place.term, Place.code)).all())
+        except OperationalError:
+            place_codes = {}
+
+def resolve_country(value: str) -> str:
+    """Código de ``value``: un nombre del gazetteer se traduce; si no, se toma como código."""
+    return place_codes.get(normalize_term(value), value.strip().upper())
+
+# Almacén columnar en memoria; ``None`` si ``SERVING_MODE`` no es ``memory``.
+memory_store: Optional[ColumnarStore] = None
+
+@on_dataset_change
+def reload_memory_store() -> None:
+    """
+    Carga ``items`` en un nuevo :class:`ColumnarStore` y lo publica con una
+    sola asignación; las peticiones en curso terminan con la copia anterior.
+    """
+    global memory_store
+    if SERVING_MODE != "memory":
+        return
+    with Session(get_engine()) as session:
+        stats = get_dataset_stats(session)
+        with item_sessions(session) as sessions:
+            links = {
+                name: [row for part in scatter(lambda s: s.execute(select(*columns)).all(), sessions) for row in part]
+                for name, columns in (
+                    ("genre", (ItemGenre.item_id, ItemGenre.genre_id)),
+                    ("country", (ItemCountry.item_id, ItemCountry.code)),
+                )
+            }
+    rows = scan_items(*[getattr(Item, c) for c in ITEM_FIELDS])
+    store = ColumnarStore(
+        ITEM_FIELDS, rows, version=stats.version if stats else 0,
+        links=links, genre_terms=genre_synonyms,
+    )
+    memory_store = store
+    logger.info("Almacén en memoria cargado: %s ítems (versión %s)", store.size, store.version)
+
+# Filtro de Bloom de los ids de ``items``; ``None`` si aún no hay tabla. Entre
+# una carga de otro proceso y su detección (``DATASET_POLL_SECONDS``) los ids
+# nuevos pueden responder 404.
+known_ids: Optional[BloomFilter] = None
+
+@on_dataset_change
+def reload_known_ids() -> None:
+    """Reconstruye el filtro de Bloom de ids y vacía la caché de ítems."""
+    global known_ids
+    with Session(get_engine()) as session:
+        try:
+            count = count_items(session)
+        except OperationalError:
+            known_ids = None
+            return
+    ids = (row["id"] for row in scan_items(Item.id))
+    known_ids = BloomFilter.from_keys(ids, capacity=count, error_rate=BLOOM_ERROR_RATE)
+    item_cache.clear()
+
+# Índices de prefijos de ``/suggest``, uno por campo de ``SUGGEST_FIELDS``.
+suggest_indexes: dict[str, PrefixIndex] = {}
+
+@on_dataset_change
+def reload_suggest_indexes() -> None:
+    """Reconstruye los índices de autocompletado y los publica de una vez."""
+    global suggest_indexes
+    values: dict[str, list[str]] = {f: [] for f in SUGGEST_FIELDS}
+    for row in scan_items(*[getattr(Item, f) for f in SUGGEST_FIELDS]):
+        for field in SUGGEST_FIELDS:
+            parts = split_values(row[field], field in MULTIVALUED_FACETS)
+            if field == "genre":
+                # Los temas de género se agrupan en minúsculas.
+                parts = [p.lower() for p in parts]
+            values[field].extend(parts)
+    suggest_indexes = {f: PrefixIndex(v) for f, v in values.items()}
+
+def warmable(path: str) -> bool:
+    """Rutas cuyas consultas se registran y repiten en el calentamiento."""
+    if path in ("/items", "/items/facets", "/genres", "/countries", "/suggest"):
+        return True
+    return path.startswith("/items/") and path not in ("/items/export", "/items/changes", "/items/batch")
+
+# Hilo del último calentamiento lanzado; el candado evita que dos repeticiones
+# (p.ej. de cambios seguidos del dataset) corran a la vez.
+_warmup_thread: Optional[threading.Thread] = None
+_warmup_lock = threading.Lock()
+
+# Registrado al final para correr después de los demás listeners, con los
+# filtros, índices y cachés ya reconstruidos.
+@on_dataset_change
+def warm_caches() -> None:
+    """
+    Repite en segundo plano las ``WARMUP_TOP`` consultas más frecuentes
+    contra el dataset nuevo, para que la petición que lo cambió
+    (``/admin/refresh``, ``/admin/items``) no espere a las repeticiones.
+    """
+    global _warmup_thread
+    shapes = query_log.top(WARMUP_TOP) if WARMUP_TOP > 0 else []
+    if not shapes:
+        return
+    _warmup_thread = threading.Thread(target=_replay_shapes, args=(shapes,), name="warmup", daemon=True)
+    _warmup_thread.start()
+
+def _replay_shapes(shapes: list[tuple[str, str]]) -> None:
+    with _warmup_lock:
+        # El hilo no tiene event loop propio.
+        ok = asyncio.run(replay(app.router, shapes))
+        logger.info("Calentamiento: %s de %s consultas frecuentes", ok, len(shapes))
+        if WARMUP_LOG_PATH:
+            query_log.save(WARMUP_LOG_PATH)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if THREADPOOL_SIZE > 0:
+        anyio.to_thread.current_default_thread_limiter().total_tokens = THREADPOOL_SIZE
+    if WARMUP_LOG_PATH:
+        query_log.load(WARMUP_LOG_PATH)
+    await run_in_threadpool(notify_dataset_changed)
+    stop = threading.Event()
+    if DATASET_POLL_SECONDS > 0:
+        threading.Thread(target=_watch_dataset_version, args=(stop,), daemon=True).start()
+    yield
+    stop.set()
+    if WARMUP_LOG_PATH:
+        query_log.save(WARMUP_LOG_PATH)
+
 app = FastAPI(
     title="API de Ítems Públicos",
     description=(
@@ -62,80 +846,683 @@ app = FastAPI(
         "la clave API correcta para re-ejecutar el proceso ETL."
     ),
     version="0.1.0",
+    lifespan=lifespan,
+)
+
+# El registro de consultas queda por dentro de la compresión: sólo le
+# interesan la ruta, los parámetros y el status.
+app.add_middleware(QueryLogMiddleware, log=query_log, include=warmable)
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=COMPRESSION_MIN_SIZE,
+    encodings=[e.strip() for e in COMPRESSION_ENCODINGS if e.strip()],
+    exclude_paths=[p.strip() for p in COMPRESSION_EXCLUDE_PATHS],
 )
 
+def admission_lane(method: str, path: str) -> Optional[str]:
+    """
+    Carril de admisión de una petición, o ``None`` si no se limita.
+
+    Las consultas por ID (``GET /items/{id}``) tienen su propio carril para
+    no quedar detrás de búsquedas, exportaciones y facetas.
+    """
+    if method == "GET":
+        if path == "/items":
+            return "search"
+        if path in ("/items/export", "/items/changes"):
+            return "export"
+        if path == "/items/facets":
+            return "facets"
+        if path.startswith("/items/"):
+            return "lookup"
+        if path in ("/genres", "/countries"):
+            return "genres"
+    elif method == "POST" and path in ("/items/batch", "/query/batch"):
+        return "batch"
+    return None
+
+if ADMISSION_ENABLED:
+    app.add_middleware(
+        AdmissionMiddleware,
+        classify=admission_lane,
+        lanes={
+            name: LaneConfig(limit, ADMISSION_QUEUE, ADMISSION_TIMEOUT)
+            for name, limit in ADMISSION_LIMITS.items()
+        },
+        default=LaneConfig(8, ADMISSION_QUEUE, ADMISSION_TIMEOUT),
+        retry_after=ADMISSION_RETRY_AFTER,
+        on_reject=lambda lane: metrics_registry.shed.inc((lane,)),
+    )
+# Se agrega al final para quedar por fuera de la compresión y del control de
+# admisión: mide los bytes que realmente salen por la red y los 503.
+app.add_middleware(MetricsMiddleware)
+
+@app.get("/metrics", include_in_schema=False)
+def metrics() -> PlainTextResponse:
+    """Expone las métricas de la API en formato de texto de Prometheus."""
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4")
+
+def _item_rows(session: Session, filters: ItemFilters, relevance: bool, columns, offset: int, limit: int) -> List[dict]:
+    """
+    Página de resultados como diccionarios, con una consulta Core (sin crear
+    objetos ORM) que sólo selecciona ``columns``, en el orden de :func:`item_order`.
+    """
+    stmt = apply_filters(select(*[getattr(Item, c) for c in columns]), filters, relevance=relevance)
+    stmt = stmt.order_by(*item_order(relevance))
+    return [dict(row) for row in session.execute(stmt.offset(offset).limit(limit)).mappings()]
+
+def _gather_rows(session: Session, filters: ItemFilters, relevance: bool, columns, offset: int, limit: int) -> List[dict]:
+    """
+    Igual que :func:`_item_rows` pero sobre todos los shards.
+
+    Cada shard devuelve sus primeras ``offset + limit`` filas en el orden de
+    :func:`item_order` y se combinan con una mezcla ordenada antes de aplicar
+    la paginación, así que las páginas coinciden con las de una sola base.
+
+    Con ``relevance`` la mezcla es aproximada: cada shard calcula BM25 con las
+    estadísticas de su propio índice FTS (frecuencia de términos, longitud
+    media), así que los puntajes de shards distintos no son del todo
+    comparables y el orden puede diferir del de una sola base.
+    """
+    with item_sessions(session) as sessions:
+        if len(sessions) == 1:
+            return _item_rows(sessions[0], filters, relevance, columns, offset, limit)
+
+        def shard_page(shard: Session) -> List[dict]:
+            stmt = apply_filters(select(*[getattr(Item, c) for c in columns]), filters, relevance=relevance)
+            if relevance:
+                stmt = stmt.add_columns(relevance_order.label("_score"))
+            stmt = stmt.order_by(*item_order(relevance))
+            return [dict(row) for row in shard.execute(stmt.limit(offset + limit)).mappings()]
+
+        pages = scatter(shard_page, sessions)
+    key = (lambda row: (row["_score"], row["id"])) if relevance else (lambda row: row["id"])
+    rows = list(islice(heapq.merge(*pages, key=key), offset, offset + limit))
+    for row in rows:
+        row.pop("_score", None)
+    return rows
+
+def coalesced(route: str, key: tuple, func: Callable[[], Any]) -> Any:
+    """
+    Ejecuta ``func`` una sola vez para peticiones concurrentes idénticas.
+
+    ``key`` son los parámetros normalizados de la consulta; se le agregan la
+    ruta y la versión del dataset, así que nunca se comparte un resultado
+    entre versiones. El resultado compartido no debe modificarse.
+    """
+    value, shared = single_flight.do((route, key, _seen_dataset_version), func)
+    counter = metrics_registry.flight_shared if shared else metrics_registry.flight_executions
+    counter.inc((route,))
+    return value
+
+def page_items(
+    session: Session, filters: ItemFilters, offset: int, limit: int,
+    columns: Optional[List[str]] = None, sort: Optional[str] = None,
+) -> List[dict]:
+    """Una página de ``/items`` (sin conteo total), para reutilizar en otros endpoints."""
+    store = memory_store
+    if store is not None and not (sort == "relevance" and filters.q):
+        return [store.row(n, columns) for n in store.page(store.match(filters), offset, limit)]
+    relevance = use_relevance(session, filters.q, sort)
+    columns = tuple(columns or ITEM_FIELDS)
+    return coalesced(
+        "/items",
+        filters.key(relevance=relevance, columns=columns, offset=offset, limit=limit),
+        lambda: _gather_rows(session, filters, relevance, columns, offset, limit),
+    )
+
 @app.get("/items", response_model=List[ItemOut])
 def list_items(
     *,
-    q: Optional[str] = Query(None, description="Término de búsqueda para el título"),
-    author: Optional[str] = Query(None, description="Filtrar por nombre de autor"),
-    type: Optional[str] = Query(None, description="Filtrar por tipo/categoría"),
-    genre: Optional[str] = Query(None, description="Filtrar por género/tema"),
-    location: Optional[str] = Query(None, description="Filtrar por ubicación"),
+    filters: ItemFilters = Depends(item_filters),
     limit: int = Query(20, ge=1, le=100, description="Número máximo de resultados a devolver"),
     offset: int = Query(0, ge=0, description="Número de ítems a omitir"),
+    fields: Optional[str] = Query(
+        None, description="Campos a devolver separados por comas, p.ej. ``title,author``"
+    ),
+    with_total: bool = Query(False, description="Incluir el header ``X-Total-Count``"),
+    sort: Optional[str] = Query(
+        None, pattern="^relevance$", description="``relevance`` ordena por BM25 sobre ``q``"
+    ),
     session: Session = Depends(get_session),
 ) -> List[ItemOut]:
     """
     Lista ítems con búsqueda y filtrado opcional.
 
     Este endpoint soporta búsqueda de texto básica en el título así como
-    filtrado por autor, tipo y ubicación. Los resultados se paginan vía
+    filtrado por autor, tipo, ubicación, género y año de publicación
+    (``year_from``, ``year_to`` o ``decade``). Los resultados se paginan vía
     los parámetros ``limit`` y ``offset``.
+
+    Con ``fields`` sólo se seleccionan (y devuelven) las columnas pedidas,
+    lo que reduce la E/S de base de datos y el tamaño de la respuesta.
+
+    Con ``with_total=true`` se agrega ``X-Total-Count`` con el total de
+    resultados y ``X-Total-Count-Exact`` indicando si es exacto o una
+    estimación de las estadísticas del ETL.
+
+    Con ``sort=relevance`` y un término ``q``, la búsqueda usa el índice de
+    texto completo sobre título, autor, resumen, género y ubicación, y los
+    resultados se ordenan por BM25 con más peso para el título y el autor. Si
+    la base de datos aún no tiene el índice se usa la búsqueda normal. Con shards, cada
+    shard puntúa con sus propias estadísticas y el orden es aproximado.
+
+    Sin ``sort`` las páginas se ordenan por ``id`` en todos los modos de
+    almacenamiento (una base, shards o memoria).
+
+    Con ``SERVING_MODE=memory`` la consulta se resuelve en el almacén
+    columnar en memoria (salvo el orden por relevancia, que usa SQLite).
     """
+    columns = parse_fields(fields)
+    store = memory_store
+    if store is not None and not (sort == "relevance" and filters.q):
+        matches = store.match(filters)
+        headers = count_headers(len(matches), True) if with_total else {}
+        page = store.page(matches, offset, limit)
+        return JSONResponse([store.row(n, columns) for n in page], headers=headers)
     try:
-        stmt = select(Item)
-        if q:
-            # Buscar en título o ubicación
-            stmt = stmt.where(
-                or_(
-                    Item.title.ilike(f"%{q}%"),
-                    Item.location.ilike(f"%{q}%")
-                )
-            )
-        if author:
-            stmt = stmt.where(Item.author.ilike(f"%{author}%"))
-        if type:
-            stmt = stmt.where(Item.type == type)
-        if location:
-            stmt = stmt.where(Item.location.ilike(f"%{location}%"))
-        if genre:
-            stmt = stmt.where(Item.genre.ilike(f"%{genre}%"))
-        stmt = stmt.offset(offset).limit(limit)
-        results = session.scalars(stmt).all()
-        return [ItemOut.from_orm(obj) for obj in results]
+        relevance = use_relevance(session, filters.q, sort)
+
+        def stmt_filter(stmt):
+            return apply_filters(stmt, filters, relevance=relevance)
+
+        headers: dict[str, str] = {}
+        if with_total:
+            key = filters.key(sort="relevance" if relevance else None)
+            headers = count_headers(*total_count(session, key, stmt_filter))
+        columns = tuple(columns or ITEM_FIELDS)
+        rows = coalesced(
+            "/items",
+            filters.key(relevance=relevance, columns=columns, offset=offset, limit=limit),
+            lambda: _gather_rows(session, filters, relevance, columns, offset, limit),
+        )
+        return JSONResponse(rows, headers=headers)
     except Exception as exc:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(exc))
 
-@app.get("/items/{item_id}", response_model=ItemOut)
-def get_item(item_id: str, session: Session = Depends(get_session)) -> ItemOut:
+def _stream_partitions(stmt) -> Iterator[list]:
+    """
+    Ejecuta ``stmt`` con un cursor del lado del servidor (``yield_per``) y
+    produce lotes de filas como mapeos.
+
+    Abre su propia sesión: la de la dependencia ``get_session`` se cierra
+    antes de que termine de enviarse una ``StreamingResponse``.
+    """
+    engines = get_shard_engines()
+    if not engines:
+        with Session(get_engine()) as session:
+            result = session.execute(stmt.execution_options(yield_per=EXPORT_BATCH_SIZE))
+            for partition in result.mappings().partitions():
+                yield partition
+        return
+    # Con shards, ``stmt`` está ordenado por ``id`` en cada uno: se mezclan.
+    def stream(engine) -> Iterator:
+        with Session(engine) as session:
+            yield from session.execute(stmt.execution_options(yield_per=EXPORT_BATCH_SIZE)).mappings()
+
+    merged = heapq.merge(*[stream(engine) for engine in engines], key=lambda row: row["id"])
+    while partition := list(islice(merged, EXPORT_BATCH_SIZE)):
+        yield partition
+
+def _export_ndjson(stmt) -> Iterator[str]:
+    for partition in _stream_partitions(stmt):
+        yield "".join(json.dumps(dict(row), ensure_ascii=False) + "\n" for row in partition)
+
+def _export_csv(stmt, columns: List[str]) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for partition in _stream_partitions(stmt):
+        writer.writerows([row[c] for c in columns] for row in partition)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+    # Encabezado de un resultado vacío
+    if buffer.tell():
+        yield buffer.getvalue()
+
+@app.get("/items/export")
+def export_items(
+    *,
+    filters: ItemFilters = Depends(item_filters),
+    fmt: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$", description="``ndjson`` o ``csv``"),
+    fields: Optional[str] = Query(
+        None, description="Campos a devolver separados por comas, p.ej. ``title,author``"
+    ),
+) -> StreamingResponse:
+    """
+    Exporta todo el catálogo (con los mismos filtros que ``/items``) en streaming.
+
+    Las filas se leen del cursor en lotes de ``EXPORT_BATCH_SIZE`` y se envían
+    a medida que llegan, por lo que la memoria es constante sin importar el
+    número de registros. El orden es estable por ``id``.
+    """
+    columns = parse_fields(fields) or list(ITEM_FIELDS)
+    stmt = select(*[getattr(Item, c) for c in columns])
+    stmt = apply_filters(stmt, filters).order_by(Item.id)
+    if fmt == "csv":
+        return StreamingResponse(
+            _export_csv(stmt, columns),
+            media_type="text/csv; charset=utf-8",
+            headers={"Content-Disposition": 'attachment; filename="items.csv"'},
+        )
+    return StreamingResponse(_export_ndjson(stmt), media_type="application/x-ndjson")
+
+def _stream_changes(since: int, until: int) -> Iterator[str]:
+    stmt = (
+        select(ItemChange.seq, ItemChange.item_id.label("id"), ItemChange.op, ItemChange.version)
+        .where(ItemChange.seq > since, ItemChange.seq <= until)
+        .order_by(ItemChange.seq)
+    )
+    with Session(get_engine()) as session:
+        result = session.execute(stmt.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        for partition in result.mappings().partitions():
+            yield "".join(json.dumps(dict(row), ensure_ascii=False) + "\n" for row in partition)
+
+@app.get("/items/changes")
+def list_changes(
+    since: int = Query(0, ge=0, description="Último ``seq`` ya procesado por el consumidor"),
+    limit: Optional[int] = Query(None, ge=1, description="Máximo de cambios a devolver"),
+    session: Session = Depends(get_session),
+) -> StreamingResponse:
+    """
+    Transmite en NDJSON los cambios de ``items`` posteriores a ``since``.
+
+    Cada línea trae ``seq``, ``id``, ``op`` (``insert`` o ``update``) y la
+    ``version`` del dataset en que el cambio es visible, en orden de ``seq``.
+    El consumidor guarda el último ``seq`` recibido (o el header
+    ``X-Change-Seq``) y lo envía como ``since`` en la siguiente
+    sincronización, cuyo costo es proporcional a los cambios y no al tamaño
+    del catálogo.
+
+    ``X-Change-Seq`` es el ``seq`` de la última línea de *esta* respuesta
+    (``since`` si no hay cambios nuevos): con ``limit`` el resto queda para la
+    siguiente página. La respuesta se acota a ese ``seq``, así que los cambios
+    registrados mientras se transmite tampoco se saltan.
+    """
+    window = select(ItemChange.seq).where(ItemChange.seq > since).order_by(ItemChange.seq).limit(limit)
+    head = session.scalar(select(func.max(window.subquery().c.seq))) or since
+    return StreamingResponse(
+        _stream_changes(since, head),
+        media_type="application/x-ndjson",
+        headers={"X-Change-Seq": str(head)},
+    )
+
+def _facet_statement(facet: str):
+    """``SELECT valor, COUNT(*) ... GROUP BY valor`` de ``facet``, sin filtros."""
+    if facet == "genre":
+        return (
+            select(ItemGenre.genre_id, func.count())
+            .join(Item, Item.id == ItemGenre.item_id)
+            .group_by(ItemGenre.genre_id)
+        )
+    if facet == "country":
+        return (
+            select(ItemCountry.code, func.count())
+            .join(Item, Item.id == ItemCountry.item_id)
+            .group_by(ItemCountry.code)
+        )
+    expr = (Item.year // 10) * 10 if facet == "decade" else getattr(Item, facet)
+    return select(expr, func.count()).where(expr.is_not(None)).group_by(expr)
+
+def facet_counts(session: Session, facet: str, stmt_filter, top: int) -> List[FacetValue]:
+    """
+    Cuenta los valores de una faceta con un único ``GROUP BY``.
+
+    ``genre`` cuenta los géneros canónicos de ``item_genres`` (por el nombre,
+    usable en ``genre=``) y ``country`` los códigos de país y región de
+    ``item_countries`` (usables en ``country=``); ambos se agrupan sobre el
+    índice de su tabla y no sobre el texto libre de la columna. ``location``
+    cuenta los lugares de su columna, como el filtro ``location=``. En Python
+    sólo se recorren los grupos (no las filas), p.ej. para separar las listas.
+    """
+    stmt = stmt_filter(_facet_statement(facet))
+    counts: Counter[str] = Counter()
+    with item_sessions(session) as sessions:
+        groups = [row for part in scatter(lambda s: s.execute(stmt).all(), sessions) for row in part]
+    for value, count in groups:
+        if facet == "decade":
+            keys = [f"{value}s"]
+        elif facet == "genre":
+            keys = [GENRE_NAMES.get(value, str(value))]
+        elif facet in MULTIVALUED_FACETS:
+            keys = [p.strip() for p in value.split(",") if p.strip()]
+        else:
+            keys = [value]
+        for key in keys:
+            counts[key] += count
+    entries = sorted(counts.items(), key=lambda kv: (-kv[1], kv[0]))
+    return [FacetValue(value=k, count=c) for k, c in entries[:top]]
+
+@app.get("/items/facets", response_model=dict[str, List[FacetValue]])
+def item_facets(
+    *,
+    filters: ItemFilters = Depends(item_filters),
+    facets: Optional[str] = Query(
+        None, description=f"Facetas a calcular separadas por comas ({', '.join(FACETS)})"
+    ),
+    top: int = Query(10, ge=1, le=100, description="Número máximo de valores por faceta"),
+    session: Session = Depends(get_session),
+) -> dict[str, List[FacetValue]]:
+    """
+    Devuelve los conteos top-k por faceta para el conjunto filtrado.
+
+    Acepta los mismos filtros que ``/items``. Cada faceta se resuelve con una
+    consulta agrupada que aprovecha el índice de su columna o, para ``genre``
+    y ``country``, el de su tabla asociada.
+    """
+    requested = [f.strip() for f in facets.split(",") if f.strip()] if facets else list(FACETS)
+    unknown = [f for f in requested if f not in FACETS]
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Facetas desconocidas: {', '.join(unknown)}. Facetas permitidas: {', '.join(FACETS)}",
+        )
+
+    def stmt_filter(stmt):
+        return apply_filters(stmt, filters)
+
+    requested = list(dict.fromkeys(requested))
+    return coalesced(
+        "/items/facets",
+        filters.key(facets=tuple(requested), top=top),
+        lambda: {facet: facet_counts(session, facet, stmt_filter, top) for facet in requested},
+    )
+
+# Debe declararse antes de ``/items/{item_id:path}``, que también la captaría.
+@app.get("/items/{item_id:path}/similar", response_model=List[SimilarItemOut])
+def similar_items(
+    item_id: str,
+    limit: int = Query(10, ge=1, le=50, description="Número máximo de ítems similares"),
+    session: Session = Depends(get_session),
+) -> List[SimilarItemOut]:
+    """
+    Devuelve los ítems más parecidos a ``item_id`` ("más como este").
+
+    La similitud (coseno sobre géneros, autores y palabras del título) se
+    precalcula en el ETL, así que la consulta es una búsqueda por clave
+    primaria en ``item_similarity`` y los ítems salen de ``item_cache``.
+    ``score`` va de 0 a 1.
+    """
+    stmt = (
+        select(ItemSimilarity.similar_id, ItemSimilarity.score)
+        .where(ItemSimilarity.item_id == item_id)
+        .order_by(ItemSimilarity.rank)
+        .limit(limit)
+    )
+    try:
+        neighbors = session.execute(stmt).all()
+    except OperationalError:
+        # Base de datos anterior al índice de similitud.
+        neighbors = []
+    if not neighbors and item_id not in lookup_items_json(session, [item_id]):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Ítem no encontrado")
+    found = lookup_items_json(session, [similar_id for similar_id, _ in neighbors])
+    return [
+        SimilarItemOut(**json.loads(found[similar_id]), score=score)
+        for similar_id, score in neighbors if similar_id in found
+    ]
+
+@app.get("/items/{item_id:path}", response_model=ItemOut)
+def get_item(
+    item_id: str,
+    fields: Optional[str] = Query(
+        None, description="Campos a devolver separados por comas, p.ej. ``title,author``"
+    ),
+    session: Session = Depends(get_session),
+) -> ItemOut:
     """
     Recupera un ítem único por su ID.
 
-    Lanza un error 404 si el ítem no existe.
+    Lanza un error 404 si el ítem no existe. Acepta ``fields`` igual que
+    ``/items``. Los ids desconocidos se descartan con el filtro de Bloom y
+    los ítems frecuentes se sirven desde ``item_cache``, sin consultar SQLite.
     """
-    item = session.get(Item, item_id)
-    if not item:
+    bloom = known_ids
+    if bloom is not None and item_id not in bloom:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Ítem no encontrado")
+    columns = parse_fields(fields)
+    if columns and memory_store is not None:
+        row = memory_store.get(item_id, columns)
+        if row is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Ítem no encontrado")
+        return JSONResponse(row)
+    if columns:
+        stmt = select(*[getattr(Item, c) for c in columns]).where(Item.id == item_id)
+        with item_sessions(session) as sessions:
+            row = sessions[shard_index(item_id, len(sessions))].execute(stmt).mappings().first()
+        if row is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Ítem no encontrado")
+        return JSONResponse(dict(row))
+    body = lookup_items_json(session, [item_id]).get(item_id)
+    if body is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Ítem no encontrado")
-    return ItemOut.from_orm(item)
+    return Response(content=body, media_type="application/json")
+
+@app.post("/items/batch", response_model=ItemBatchOut)
+def get_items_batch(payload: ItemBatchIn, session: Session = Depends(get_session)) -> ItemBatchOut:
+    """
+    Recupera muchos ítems por ID en una sola petición.
+
+    Los ítems se devuelven en el orden de ``ids`` (sin duplicados) y los ids
+    inexistentes se listan en ``missing``.
+    """
+    found = lookup_items_json(session, payload.ids)
+    ordered = list(dict.fromkeys(payload.ids))
+    # Se arma el JSON con los ítems ya serializados en lugar de validarlos de nuevo.
+    items = b",".join(found[i] for i in ordered if i in found)
+    missing = json.dumps([i for i in ordered if i not in found], ensure_ascii=False).encode()
+    return Response(content=b'{"items":[' + items + b'],"missing":' + missing + b"}", media_type="application/json")
+
+def _run_subquery(session: Session, query) -> Any:
+    if isinstance(query, ItemsSubQuery):
+        filters = ItemFilters(
+            query.q, query.author, query.type, query.genre, query.location,
+            query.year_from, query.year_to, query.decade,
+            resolve_country(query.country) if query.country else None,
+        )
+        return page_items(session, filters, query.offset, query.limit, parse_fields(query.fields), query.sort)
+    if isinstance(query, GenresSubQuery):
+        return [g.model_dump() for g in genre_counts(session, query.top)]
+    found = lookup_items_json(session, query.ids)
+    ordered = list(dict.fromkeys(query.ids))
+    return {
+        "items": [json.loads(found[i]) for i in ordered if i in found],
+        "missing": [i for i in ordered if i not in found],
+    }
+
+@app.post("/query/batch", response_model=QueryBatchOut)
+def query_batch(payload: QueryBatchIn, session: Session = Depends(get_session)) -> JSONResponse:
+    """
+    Ejecuta varias sub-consultas con nombre en una sola petición.
 
-@app.post("/admin/refresh", status_code=status.HTTP_202_ACCEPTED)
-def refresh(x_api_key: Optional[str] = Header(None, alias="X-API-KEY")) -> dict:
+    Cada sub-consulta indica su ``kind``: ``items`` (filtros de ``/items``),
+    ``genres`` (``/genres``) o ``item_ids`` (``/items/batch``). Todas usan la
+    misma sesión de base de datos y los resultados se devuelven por nombre con
+    su ``status``; un error en una sub-consulta no afecta a las demás.
+    """
+    results: dict[str, dict] = {}
+    for name, query in payload.queries.items():
+        try:
+            results[name] = {"status": status.HTTP_200_OK, "data": _run_subquery(session, query)}
+        except HTTPException as exc:
+            results[name] = {"status": exc.status_code, "error": exc.detail}
+        except Exception:
+            # La transacción puede haber quedado inválida (p.ej. tras un error
+            # de SQLAlchemy); se descarta para que las demás sub-consultas sigan.
+            logger.exception("Error en la sub-consulta %s de /query/batch", name)
+            session.rollback()
+            results[name] = {
+                "status": status.HTTP_500_INTERNAL_SERVER_ERROR,
+                "error": "Error interno al ejecutar la sub-consulta",
+            }
+    return JSONResponse({"results": results})
+
+@app.post("/admin/refresh", status_code=status.HTTP_202_ACCEPTED, dependencies=[Depends(verify_api_key)])
+def refresh() -> dict:
     """
     Refresca el conjunto de datos re-ejecutando el pipeline ETL.
 
     Este endpoint está protegido con una clave API simple. Para invocarlo, proporciona
     el header ``X-API-KEY`` con el valor de la variable de entorno ``API_KEY``.
     Se devuelve un código de estado ``202 Accepted`` inmediatamente; el proceso
-    ETL se ejecuta síncronamente en esta implementación.
+    ETL se ejecuta síncronamente en esta implementación. Además de recargar los
+    datos, reconstruye por completo el índice de similitud que ``/admin/items``
+    sólo actualiza de forma parcial.
     """
-    if x_api_key != API_KEY:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Clave API inválida")
     # Ejecutar el proceso ETL. Esta llamada es síncrona; para un sistema de producción
     # considera delegar a una tarea en segundo plano o cola de trabajo.
+    # El ETL (y ``requests``) se importa aquí para no alargar el arranque.
+    from etl.load import run as etl_run
+
     etl_run()
+    reload_snapshot()
+    notify_dataset_changed()
     return {"status": "refresco iniciado"}
 
+async def _ndjson_lines(stream: AsyncIterator[bytes]) -> AsyncIterator[tuple[int, bytes]]:
+    """Separa el cuerpo en líneas ``(número, bytes)`` a medida que llega."""
+    buffer = b""
+    line_no = 0
+    async for chunk in stream:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            line_no += 1
+            yield line_no, line
+        if len(buffer) > INGEST_MAX_LINE_BYTES:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"La línea {line_no + 1} supera {INGEST_MAX_LINE_BYTES} bytes",
+            )
+    if buffer:
+        yield line_no + 1, buffer
+
+def _validation_message(exc: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(map(str, e['loc'])) or 'registro'}: {e['msg']}" for e in exc.errors())
+
+def _prepare_databases() -> None:
+    from etl.load import prepare_database
+
+    for engine in [get_write_engine(), *get_shard_engines()]:
+        prepare_database(engine)
+
+def _upsert_batch(records: List[dict]) -> tuple[int, List[str]]:
+    """Carga un lote en su transacción; devuelve ``(cargados, ids modificados)``."""
+    from etl.load import load_shards, log_changes, upsert_items
+
+    with Session(get_write_engine()) as session:
+        if get_shard_engines():
+            _, changes = load_shards(get_shard_engines(), records)
+        else:
+            changes = upsert_items(session, records)
+        log_changes(session, changes)
+        session.commit()
+    return len(records), [item_id for item_id, _ in changes]
+
+def _finish_ingest(touched: Set[str]) -> int:
+    """
+    Cierra una ingesta: actualiza la similitud y la versión del dataset.
+
+    Sólo se recalculan los vecinos de los ítems afectados por ``touched``
+    (ver ``refresh_similarity``), pero el coste sigue creciendo con el
+    catálogo: los vectores se construyen con todos los ítems para los pesos
+    IDF y, con ``SNAPSHOT_DIR``, se publica una copia completa de la base.
+    Conviene enviar lotes grandes y poco frecuentes en lugar de muchos
+    pequeños.
+    """
+    from etl.load import shard_rows, update_dataset_stats
+    from etl.similarity import refresh_similarity
+
+    engines = get_shard_engines()
+    with Session(get_write_engine()) as session:
+        if touched:
+            rows = shard_rows(engines, Item.id, Item.author, Item.genre, Item.title) if engines else None
+            refresh_similarity(session, touched, rows)
+        version = update_dataset_stats(session, count_items(session)).version
+        session.commit()
+    if SNAPSHOT_DIR:
+        publish_snapshot(DB_URL, SNAPSHOT_DIR)
+        reload_snapshot()
+    notify_dataset_changed()
+    return version
+
+@app.post("/admin/items", response_model=IngestOut, dependencies=[Depends(verify_api_key)])
+async def ingest_items(request: Request) -> IngestOut:
+    """
+    Inserta o reemplaza ítems enviados como NDJSON (un objeto ``Item`` por línea).
+
+    El cuerpo se lee en streaming: las líneas se validan y se cargan en lotes
+    de ``INGEST_BATCH_SIZE`` con el cargador masivo del ETL, cada lote en su
+    propia transacción, así que la memoria no depende del tamaño del envío.
+    Las líneas inválidas se reportan (número de línea y error) sin detener la
+    carga. Al terminar se incrementa la versión del dataset una sola vez y
+    se recalcula la similitud de los ítems afectados (ver ``_finish_ingest``:
+    cada llamada tiene un coste proporcional al catálogo, así que conviene
+    agrupar los envíos).
+    """
+    await run_in_threadpool(_prepare_databases)
+    batches: List[IngestBatchOut] = []
+    records: List[dict] = []
+    errors: List[IngestError] = []
+    rejected = 0
+    touched: Set[str] = set()
+
+    async def flush() -> None:
+        nonlocal records, errors, rejected
+        upserted, changed = await run_in_threadpool(_upsert_batch, records) if records else (0, [])
+        touched.update(changed)
+        batches.append(IngestBatchOut(
+            batch=len(batches) + 1, received=len(records) + rejected,
+            upserted=upserted, rejected=rejected, errors=errors,
+        ))
+        records, errors, rejected = [], [], 0
+
+    try:
+        async for line_no, line in _ndjson_lines(request.stream()):
+            if not line.strip():
+                continue
+            try:
+                records.append(ItemIn.model_validate_json(line).model_dump())
+            except ValidationError as exc:
+                rejected += 1
+                if len(errors) < INGEST_MAX_ERRORS_PER_BATCH:
+                    errors.append(IngestError(line=line_no, error=_validation_message(exc)))
+            if len(records) + rejected >= INGEST_BATCH_SIZE:
+                await flush()
+        if records or rejected:
+            await flush()
+    finally:
+        # Los lotes ya confirmados quedan visibles aunque el envío falle a medias.
+        version = await run_in_threadpool(_finish_ingest, touched) if any(b.upserted for b in batches) else None
+    if version is None:
+        version = await run_in_threadpool(current_dataset_version)
+    return IngestOut(
+        received=sum(b.received for b in batches),
+        upserted=sum(b.upserted for b in batches),
+        rejected=sum(b.rejected for b in batches),
+        version=version,
+        batches=batches,
+    )
+
+@app.get("/admin/slow-queries", dependencies=[Depends(verify_api_key)])
+def slow_queries() -> dict:
+    """
+    Devuelve la bitácora de consultas lentas.
+
+    ``shapes`` agrupa las sentencias por forma (SQL sin valores concretos),
+    ordenadas por tiempo total, con su plan de ejecución y ``full_scan``
+    indicando si recorren la tabla completa. ``recent`` lista las últimas
+    sentencias registradas con sus parámetros.
+    """
+    return slow_query_log.report()
+
+@app.delete("/admin/slow-queries", status_code=status.HTTP_204_NO_CONTENT, dependencies=[Depends(verify_api_key)])
+def reset_slow_queries() -> Response:
+    """Vacía la bitácora de consultas lentas."""
+    slow_query_log.reset()
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
 @app.get("/genres", response_model=List[GenreOut])
 def list_genres(
     *,
@@ -146,8 +1533,59 @@ def list_genres(
 
     Divide el campo ``genre`` (CSV) y normaliza a minúsculas.
     """
+    return genre_counts(session)
+
+@app.get("/genres/vocabulary", response_model=List[GenreVocabularyOut])
+def genre_vocabulary(session: Session = Depends(get_session)) -> List[GenreVocabularyOut]:
+    """
+    Devuelve el vocabulario controlado de géneros con sus sinónimos
+    normalizados (sin tildes, en minúsculas).
+
+    ``/items?genre=`` acepta cualquiera de esos sinónimos y filtra por el
+    género canónico: "terror", "horror" y "Horror fiction" dan lo mismo.
+    """
+    synonyms: dict[int, List[str]] = {}
+    for term, genre_id in session.execute(select(GenreSynonym.term, GenreSynonym.genre_id).order_by(GenreSynonym.term)):
+        synonyms.setdefault(genre_id, []).append(term)
+    return [
+        GenreVocabularyOut(id=genre.id, name=genre.name, synonyms=synonyms.get(genre.id, []))
+        for genre in session.scalars(select(Genre).order_by(Genre.id))
+    ]
+
+@app.get("/countries", response_model=List[CountryOut])
+def list_countries(session: Session = Depends(get_session)) -> List[CountryOut]:
+    """
+    Devuelve los países y regiones del gazetteer con su número de ítems y los
+    nombres de lugar (normalizados) que se resuelven a cada uno.
+
+    Cualquiera de esos nombres, o el código, sirve como ``/items?country=``.
+    """
+    stmt = (
+        select(ItemCountry.code, func.count())
+        .join(Item, Item.id == ItemCountry.item_id)
+        .group_by(ItemCountry.code)
+    )
+    counts: Counter[str] = Counter()
+    with item_sessions(session) as sessions:
+        for part in scatter(lambda s: s.execute(stmt).all(), sessions):
+            counts.update(dict(part))
+    places: dict[str, List[str]] = {}
+    for term, code in session.execute(select(Place.term, Place.code).order_by(Place.term)):
+        places.setdefault(code, []).append(term)
+    entries = sorted(places.items(), key=lambda kv: (-counts[kv[0]], kv[0]))
+    return [
+        CountryOut(code=code, name=PLACE_NAMES.get(code, code), count=counts[code], places=terms)
+        for code, terms in entries
+    ]
+
+def genre_counts(session: Session, top: int = 200) -> List[GenreOut]:
+    """Cuenta los géneros (CSV en ``genre``) en minúsculas, de mayor a menor frecuencia."""
+    return coalesced("/genres", (top,), lambda: _genre_counts(session, top))
+
+def _genre_counts(session: Session, top: int) -> List[GenreOut]:
     stmt = select(Item.genre)
-    rows = session.execute(stmt).all()
+    with item_sessions(session) as sessions:
+        rows = [row for part in scatter(lambda s: s.execute(stmt).all(), sessions) for row in part]
     counts: dict[str, int] = {}
     for (g,) in rows:
         if not g:
@@ -157,4 +1595,27 @@ def list_genres(
             counts[p] = counts.get(p, 0) + 1
     # construir respuesta ordenada por frecuencia desc
     entries = sorted(counts.items(), key=lambda kv: kv[1], reverse=True)
-    return [GenreOut(name=name, count=count) for name, count in entries[:200]]
\ No newline at end of file
+    return [GenreOut(name=name, count=count) for name, count in entries[:top]]
+
+@app.get("/suggest", response_model=List[FacetValue])
+def suggest(
+    *,
+    prefix: str = Query(..., min_length=1, max_length=100, description="Texto escrito hasta ahora"),
+    field: str = Query("title", description=f"Campo a completar ({', '.join(SUGGEST_FIELDS)})"),
+    limit: int = Query(10, ge=1, le=50, description="Número máximo de sugerencias"),
+) -> JSONResponse:
+    """
+    Autocompletado de títulos, autores y géneros mientras se escribe.
+
+    Se responde desde un índice de prefijos en memoria (sin consultar SQLite),
+    reconstruido con cada versión del dataset. No distingue acentos ni
+    mayúsculas y el prefijo puede empezar en cualquier palabra del valor.
+    """
+    if field not in SUGGEST_FIELDS:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Campo desconocido: {field}. Campos permitidos: {', '.join(SUGGEST_FIELDS)}",
+        )
+    index = suggest_indexes.get(field)
+    matches = index.complete(prefix, limit) if index is not None else []
+    return JSONResponse([{"value": v, "count": c} for v, c in matches])
@@ -0,0 +1,191 @@
+"""
+Motor de servicio en memoria, columnar, para ``/items``.
+
+Con ``SERVING_MODE=memory`` la API carga la tabla ``items`` completa al
+arrancar (y tras cada recarga del dataset) en un :class:`ColumnarStore`:
+
+- una lista por columna, con las cadenas internadas (``sys.intern``) para
+  que los valores repetidos (tipos, autores, géneros) se guarden una sola vez;
+- índices invertidos ``valor -> filas`` para ``author``, ``type``,
+  ``location``, ``genre`` y ``year``, y ``token -> filas`` para las palabras
+  de título y ubicación.
+
+Los géneros canónicos de ``item_genres`` se cargan como un índice más
+``género -> filas``, de modo que ``genre=`` con un sinónimo del vocabulario
+se resuelve igual que en SQLite; lo mismo con los códigos de país de
+``item_countries`` para ``country=``.
+
+Los filtros de ``list_items`` se resuelven como intersecciones de conjuntos.
+Los filtros ``ilike`` (subcadena sin distinguir mayúsculas) se evalúan sobre
+los valores *distintos* de cada índice, no sobre las filas, y ``q`` usa el
+índice de tokens como prefiltro antes de verificar la subcadena.
+
+La base de datos sigue siendo la fuente de verdad: el almacén es inmutable y
+se reemplaza completo (una asignación atómica) cuando cambia el dataset.
+"""
+from __future__ import annotations
+
+import heapq
+import re
+import sys
+from typing import Any, Iterable, Mapping, Optional, Union
+
+from etl.vocabulary import normalize_term
+
+_TOKEN = re.compile(r"\w+")
+
+
+def _intern(value: Any) -> Any:
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+def _tokens(text: Optional[str]) -> set[str]:
+    return set(_TOKEN.findall(text.lower())) if text else set()
+
+
+class ColumnarStore:
+    """
+    Copia inmutable y columnar de la tabla ``items``.
+
+    Parameters
+    ----------
+    fields : sequence of str
+        Columnas a cargar, en el orden de ``ItemOut``.
+    rows : iterable of mapping
+        Filas ordenadas por ``id``; las páginas conservan ese orden, el mismo
+        de las consultas a SQLite (ver ``api.main.item_order``).
+    version : int
+        Versión del dataset (``dataset_stats.version``) de la que se cargó.
+    links : mapping, optional
+        Pares ``(id, valor)`` de tablas asociadas por nombre, p.ej.
+        ``{"genre": [(item_id, genre_id), ...]}``.
+    genre_terms : mapping, optional
+        Sinónimo normalizado -> id de género (``genre_synonyms``).
+    """
+
+    INDEXED = ("author", "type", "location", "genre", "year")
+
+    def __init__(
+        self,
+        fields: Iterable[str],
+        rows: Iterable[Mapping[str, Any]],
+        version: int = 0,
+        links: Optional[Mapping[str, Iterable[tuple[str, Any]]]] = None,
+        genre_terms: Optional[Mapping[str, int]] = None,
+    ) -> None:
+        self.fields = tuple(fields)
+        self.version = version
+        self.columns: dict[str, list] = {f: [] for f in self.fields}
+        self.indexes: dict[str, dict[Any, set[int]]] = {f: {} for f in self.INDEXED}
+        self.tokens: dict[str, set[int]] = {}
+        self.row_by_id: dict[str, int] = {}
+        for n, row in enumerate(rows):
+            for f in self.fields:
+                self.columns[f].append(_intern(row[f]))
+            self.row_by_id[row["id"]] = n
+            for f in self.INDEXED:
+                value = row[f]
+                if value is not None:
+                    self.indexes[f].setdefault(_intern(value), set()).add(n)
+            for token in _tokens(row["title"]) | _tokens(row["location"]):
+                self.tokens.setdefault(sys.intern(token), set()).add(n)
+        self.size = len(self.row_by_id)
+        self.links: dict[str, dict[Any, set[int]]] = {}
+        for name, pairs in (links or {}).items():
+            index = self.links[name] = {}
+            for item_id, value in pairs:
+                n = self.row_by_id.get(item_id)
+                if n is not None:
+                    index.setdefault(value, set()).add(n)
+        self.genre_terms = dict(genre_terms or {})
+        # Valores en minúsculas de cada índice de texto, para los filtros ilike.
+        self._lowered = {
+            f: [(str(v).lower(), rows_) for v, rows_ in self.indexes[f].items()]
+            for f in ("author", "location", "genre")
+        }
+
+    # --- filtros ---
+    def _contains(self, field: str, needle: str) -> set[int]:
+        needle = needle.lower()
+        result: set[int] = set()
+        for value, rows in self._lowered[field]:
+            if needle in value:
+                result |= rows
+        return result
+
+    def _text_search(self, q: str) -> set[int]:
+        """Equivalente a ``title ILIKE %q% OR location ILIKE %q%``."""
+        needle = q.lower()
+        words = _TOKEN.findall(needle)
+        candidates: Optional[set[int]] = None
+        # Cada palabra de q aparece dentro de algún token del texto, así que la
+        # unión de los tokens que la contienen es un superconjunto exacto.
+        for word in words:
+            rows: set[int] = set()
+            for token, postings in self.tokens.items():
+                if word in token:
+                    rows |= postings
+            candidates = rows if candidates is None else candidates & rows
+            if not candidates:
+                return set()
+        if candidates is None:
+            candidates = set(range(self.size))
+        titles, locations = self.columns["title"], self.columns["location"]
+        return {
+            r for r in candidates
+            if needle in titles[r].lower() or (locations[r] is not None and needle in locations[r].lower())
+        }
+
+    def _year_range(self, low: Optional[int], high: Optional[int]) -> set[int]:
+        result: set[int] = set()
+        for year, rows in self.indexes["year"].items():
+            if (low is None or year >= low) and (high is None or year <= high):
+                result |= rows
+        return result
+
+    def match(self, filters) -> Union[set[int], range]:
+        """
+        Devuelve las filas que cumplen ``filters``.
+
+        El resultado es de sólo lectura (puede ser un índice interno); usa
+        :meth:`page` para obtener una página en orden de carga.
+        """
+        sets: list[set[int]] = []
+        if filters.type:
+            sets.append(self.indexes["type"].get(filters.type, set()))
+        if filters.author:
+            sets.append(self._contains("author", filters.author))
+        if filters.location:
+            sets.append(self._contains("location", filters.location))
+        if filters.country:
+            sets.append(self.links.get("country", {}).get(filters.country, set()))
+        if filters.genre:
+            genre_id = self.genre_terms.get(normalize_term(filters.genre))
+            if genre_id is not None:
+                sets.append(self.links.get("genre", {}).get(genre_id, set()))
+            else:
+                sets.append(self._contains("genre", filters.genre))
+        low, high = filters.year_range()
+        if low is not None or high is not None:
+            sets.append(self._year_range(low, high))
+        if filters.q:
+            sets.append(self._text_search(filters.q))
+        if not sets:
+            return range(self.size)
+        sets.sort(key=len)
+        return sets[0].intersection(*sets[1:]) if len(sets) > 1 else sets[0]
+
+    @staticmethod
+    def page(rows: Union[set[int], range], offset: int, limit: int) -> list[int]:
+        """Selecciona ``rows[offset:offset + limit]`` en orden de carga sin ordenar todo."""
+        if isinstance(rows, range):
+            return list(rows[offset:offset + limit])
+        return heapq.nsmallest(offset + limit, rows)[offset:]
+
+    # --- proyección ---
+    def row(self, n: int, fields: Optional[Iterable[str]] = None) -> dict[str, Any]:
+        return {f: self.columns[f][n] for f in (fields or self.fields)}
+
+    def get(self, item_id: str, fields: Optional[Iterable[str]] = None) -> Optional[dict[str, Any]]:
+        n = self.row_by_id.get(item_id)
+        return None if n is None else self.row(n, fields)
@@ -0,0 +1,279 @@
+"""
+Métricas de la API en formato de texto de Prometheus, sin servicios externos.
+
+El :class:`MetricsMiddleware` registra por ruta (la plantilla, p.ej.
+``/items/{item_id:path}``, no la URL concreta) el número de peticiones, la
+latencia, el tiempo pasado en SQLite, el tamaño de la respuesta y los
+errores. :func:`instrument_engine` mide cada sentencia SQL mediante los
+eventos ``before_cursor_execute``/``after_cursor_execute`` de SQLAlchemy y
+la atribuye a la petición en curso.
+
+Los histogramas usan buckets fijos; los percentiles p50/p95/p99 se estiman
+por interpolación dentro de los buckets al renderizar ``/metrics``.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Iterable, Optional
+
+from sqlalchemy import event
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Iterable[str], values: Iterable[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format(value: Optional[float]) -> str:
+    if value is None:
+        return "NaN"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Contador monótono con etiquetas."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = ()) -> None:
+        self.name, self.help, self.labelnames = name, help, labelnames
+        self._values: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels: tuple = (), amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, labels: tuple = ()) -> float:
+        return self._values.get(labels, 0)
+
+    def samples(self) -> list[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_labels(self.labelnames, k)} {_format(v)}" for k, v in items]
+
+
+class Gauge(Counter):
+    """Valor que puede subir y bajar."""
+
+    kind = "gauge"
+
+    def set(self, labels: tuple, value: float) -> None:
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram:
+    """Histograma acumulativo con buckets fijos y etiquetas."""
+
+    kind = "histogram"
+
+    def __init__(
+        self, name: str, help: str, buckets: tuple[float, ...], labelnames: tuple[str, ...] = ()
+    ) -> None:
+        self.name, self.help, self.labelnames = name, help, labelnames
+        self.buckets = buckets
+        # Por etiqueta: [conteos por bucket (+Inf al final), suma, total]
+        self._values: dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels: tuple, value: float) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def quantile(self, labels: tuple, q: float) -> Optional[float]:
+        """Estima el cuantil ``q`` interpolando linealmente dentro del bucket."""
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None or entry[2] == 0:
+                return None
+            counts, total = list(entry[0]), entry[2]
+        rank = q * total
+        seen = 0
+        for i, count in enumerate(counts):
+            if seen + count >= rank and count:
+                if i == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[i - 1] if i else 0.0
+                return lower + (self.buckets[i] - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+    def label_sets(self) -> list[tuple]:
+        with self._lock:
+            return sorted(self._values)
+
+    def samples(self) -> list[str]:
+        with self._lock:
+            items = sorted((k, (list(v[0]), v[1], v[2])) for k, v in self._values.items())
+        lines = []
+        for labels, (counts, total_sum, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else _format(float(bound))
+                extra = f'le="{le}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, extra)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_format(total_sum)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {total}")
+        return lines
+
+
+class MetricsRegistry:
+    """Conjunto de métricas de la API y su renderizado para Prometheus."""
+
+    def __init__(self) -> None:
+        route = ("method", "route")
+        self.requests = Counter("api_requests_total", "Peticiones HTTP atendidas", route + ("status",))
+        self.errors = Counter("api_request_errors_total", "Peticiones con estado 5xx", route)
+        self.in_flight = Gauge("api_requests_in_flight", "Peticiones en curso")
+        self.latency = Histogram(
+            "api_request_duration_seconds", "Latencia total de la petición", LATENCY_BUCKETS, route
+        )
+        self.db_time = Histogram(
+            "api_request_db_seconds", "Tiempo de SQL por petición", LATENCY_BUCKETS, route
+        )
+        self.response_size = Histogram(
+            "api_response_size_bytes", "Bytes enviados en el cuerpo de la respuesta", SIZE_BUCKETS, route
+        )
+        self.sql_statements = Counter("db_statements_total", "Sentencias SQL ejecutadas", ("route",))
+        self.sql_latency = Histogram(
+            "db_statement_duration_seconds", "Duración de cada sentencia SQL", LATENCY_BUCKETS, ("route",)
+        )
+        self.shed = Counter(
+            "api_requests_shed_total", "Peticiones rechazadas por el control de admisión", ("lane",)
+        )
+        self.flight_executions = Counter(
+            "singleflight_executions_total", "Consultas agrupables ejecutadas contra la base", ("route",)
+        )
+        self.flight_shared = Counter(
+            "singleflight_shared_total", "Peticiones que reutilizaron una consulta idéntica en curso", ("route",)
+        )
+        self.metrics: list = [
+            self.requests, self.errors, self.in_flight, self.latency,
+            self.db_time, self.response_size, self.sql_statements, self.sql_latency, self.shed,
+            self.flight_executions, self.flight_shared,
+        ]
+
+    def render(self) -> str:
+        lines: list[str] = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        name = "api_request_duration_quantile_seconds"
+        lines.append(f"# HELP {name} Percentiles de latencia estimados a partir del histograma")
+        lines.append(f"# TYPE {name} gauge")
+        for labels in self.latency.label_sets():
+            for q in QUANTILES:
+                value = self.latency.quantile(labels, q)
+                extra = f'quantile="{q}"'
+                lines.append(f"{name}{_labels(self.latency.labelnames, labels, extra)} {_format(value)}")
+        return "\n".join(lines) + "\n"
+
+
+class _RequestTiming:
+    """Acumulador del tiempo de SQL de la petición en curso."""
+
+    __slots__ = ("scope", "db_seconds")
+
+    def __init__(self, scope: Scope) -> None:
+        self.scope = scope
+        self.db_seconds = 0.0
+
+    @property
+    def route(self) -> str:
+        # El router de FastAPI agrega la ruta resuelta al scope de la petición.
+        return getattr(self.scope.get("route"), "path", "unmatched")
+
+
+# El contexto se copia a los hilos del threadpool donde corren los endpoints
+# síncronos, así que los eventos de SQLAlchemy ven el acumulador de su petición.
+_current_request: ContextVar[Optional[_RequestTiming]] = ContextVar("_current_request", default=None)
+
+registry = MetricsRegistry()
+
+
+def instrument_engine(engine, metrics: MetricsRegistry = registry) -> None:
+    """Registra los eventos de SQLAlchemy que miden cada sentencia SQL."""
+
+    # El inicio se guarda en el contexto de ejecución (uno por sentencia) y no
+    # en la conexión: si la sentencia falla ``after_cursor_execute`` no corre,
+    # y una pila por conexión quedaría desalineada en el pool.
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context.metrics_query_start = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        start = getattr(context, "metrics_query_start", None)
+        if start is None:
+            return
+        elapsed = time.perf_counter() - start
+        timing = _current_request.get()
+        route = timing.route if timing is not None else "background"
+        if timing is not None:
+            timing.db_seconds += elapsed
+        metrics.sql_statements.inc((route,))
+        metrics.sql_latency.observe((route,), elapsed)
+
+
+class MetricsMiddleware:
+    """Middleware ASGI que alimenta el :class:`MetricsRegistry`."""
+
+    def __init__(self, app: ASGIApp, metrics: MetricsRegistry = registry) -> None:
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        timing = _RequestTiming(scope)
+        token = _current_request.set(timing)
+        status_code = 500
+        size = 0
+        start = time.perf_counter()
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code, size
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        self.metrics.in_flight.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            self.metrics.in_flight.inc(amount=-1)
+            _current_request.reset(token)
+            labels = (scope["method"], timing.route)
+            self.metrics.requests.inc(labels + (str(status_code),))
+            if status_code >= 500:
+                self.metrics.errors.inc(labels)
+            self.metrics.latency.observe(labels, time.perf_counter() - start)
+            self.metrics.db_time.observe(labels, timing.db_seconds)
+            self.metrics.response_size.observe(labels, size)
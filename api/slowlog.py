@@ -0,0 +1,145 @@
+"""
+Registro de consultas lentas con captura de ``EXPLAIN QUERY PLAN``.
+
+Cada sentencia que supera el umbral configurado se registra con sus
+parámetros, duración y plan de ejecución, y se agrega por *forma* de
+consulta: el SQL con los literales y las listas ``IN`` colapsados. Como
+``list_items`` genera un SQL distinto por cada combinación de filtros, la
+forma identifica la combinación y su plan indica si necesita un índice
+(``SCAN items`` en lugar de ``SEARCH items USING INDEX ...``).
+"""
+from __future__ import annotations
+
+import logging
+import re
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Optional
+
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r"\s+")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+
+
+def query_shape(statement: str) -> str:
+    """Normaliza una sentencia SQL para agrupar las que sólo difieren en valores."""
+    shape = _WHITESPACE.sub(" ", statement).strip()
+    shape = _STRING_LITERAL.sub("?", shape)
+    shape = _NUMBER_LITERAL.sub("?", shape)
+    return _IN_LIST.sub("(?, ...)", shape)
+
+
+def _uses_full_scan(plan: list[str]) -> bool:
+    return any(line.startswith("SCAN") and "VIRTUAL TABLE" not in line for line in plan)
+
+
+class SlowQueryLog:
+    """
+    Bitácora en memoria de sentencias lentas, agregadas por forma.
+
+    Parameters
+    ----------
+    threshold_ms : float
+        Duración mínima (ms) para registrar una sentencia. Un valor negativo
+        desactiva el registro.
+    max_entries : int
+        Número de sentencias recientes que se conservan.
+    explain : bool
+        Si se captura ``EXPLAIN QUERY PLAN`` para las sentencias ``SELECT``.
+    """
+
+    def __init__(self, threshold_ms: float = 100.0, max_entries: int = 200, explain: bool = True) -> None:
+        self.threshold_ms = threshold_ms
+        self.explain = explain
+        self.recent: deque[dict[str, Any]] = deque(maxlen=max_entries)
+        self.shapes: dict[str, dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.threshold_ms >= 0
+
+    def record(self, statement: str, parameters: Any, duration_ms: float, plan: Optional[list[str]]) -> None:
+        shape = query_shape(statement)
+        entry = {
+            "at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "duration_ms": round(duration_ms, 3),
+            "statement": statement,
+            "parameters": repr(parameters),
+            "plan": plan,
+            "shape": shape,
+        }
+        with self._lock:
+            self.recent.append(entry)
+            agg = self.shapes.get(shape)
+            if agg is None:
+                agg = self.shapes[shape] = {
+                    "shape": shape, "count": 0, "total_ms": 0.0, "max_ms": 0.0,
+                    "plan": plan, "full_scan": _uses_full_scan(plan or []),
+                }
+            agg["count"] += 1
+            agg["total_ms"] = round(agg["total_ms"] + duration_ms, 3)
+            agg["max_ms"] = round(max(agg["max_ms"], duration_ms), 3)
+            if plan:
+                agg["plan"] = plan
+                agg["full_scan"] = _uses_full_scan(plan)
+        logger.warning("Consulta lenta (%.1f ms): %s %r", duration_ms, _WHITESPACE.sub(" ", statement), parameters)
+
+    def report(self) -> dict[str, Any]:
+        """Resumen por forma (ordenado por tiempo total) y sentencias recientes."""
+        with self._lock:
+            shapes = sorted((dict(a) for a in self.shapes.values()), key=lambda a: -a["total_ms"])
+            recent = list(self.recent)
+        for agg in shapes:
+            agg["avg_ms"] = round(agg["total_ms"] / agg["count"], 3)
+        return {"threshold_ms": self.threshold_ms, "shapes": shapes, "recent": recent[::-1]}
+
+    def reset(self) -> None:
+        with self._lock:
+            self.recent.clear()
+            self.shapes.clear()
+
+
+def _explain(conn, statement: str, parameters: Any) -> Optional[list[str]]:
+    """Obtiene el plan con un cursor DBAPI aparte, sin disparar eventos."""
+    try:
+        cursor = conn.connection.dbapi_connection.cursor()
+        try:
+            cursor.execute(f"EXPLAIN QUERY PLAN {statement}", parameters)
+            return [row[-1] for row in cursor.fetchall()]
+        finally:
+            cursor.close()
+    except Exception as exc:
+        logger.debug("No se pudo obtener el plan de la consulta: %s", exc)
+        return None
+
+
+def instrument_engine(engine, log: SlowQueryLog) -> None:
+    """Registra los eventos de SQLAlchemy que alimentan ``log``."""
+
+    # Igual que en ``api.metrics``: el inicio vive en el contexto de ejecución
+    # para que una sentencia fallida no deje nada pendiente en la conexión.
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context.slowlog_query_start = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        start = getattr(context, "slowlog_query_start", None)
+        if start is None:
+            return
+        duration_ms = (time.perf_counter() - start) * 1000
+        if not log.enabled or duration_ms < log.threshold_ms:
+            return
+        plan = None
+        if log.explain and not executemany and statement.lstrip().upper().startswith(("SELECT", "WITH")):
+            plan = _explain(conn, statement, parameters)
+        log.record(statement, parameters, duration_ms, plan)
@@ -0,0 +1,107 @@
+"""
+Índice de prefijos en memoria para el autocompletado de ``/suggest``.
+
+Cada valor distinto de un campo (título, autor o género) se indexa una vez
+por cada inicio de palabra: ``"Crónica de una muerte anunciada"`` responde
+tanto a ``cro`` como a ``muer``. Las claves se normalizan sin acentos ni
+mayúsculas y se guardan en una lista ordenada, así que una búsqueda es un
+par de ``bisect`` más el recorrido del rango que comparte el prefijo.
+
+Los prefijos cortos (hasta ``SHORT_PREFIX`` caracteres) comparten un rango
+que abarca buena parte del índice, así que sus primeras ``TOP_K``
+sugerencias se ordenan una sola vez al construirlo y se responden sin
+recorrer nada.
+"""
+from __future__ import annotations
+
+import heapq
+import re
+from bisect import bisect_left
+from collections import Counter
+from typing import Iterable, Optional
+
+from etl.vocabulary import normalize_term
+
+_WORD_START = re.compile(r"\b\w")
+_WHITESPACE = re.compile(r"\s+")
+
+# Prefijos con sugerencias precalculadas: longitud máxima y cuántas se guardan
+# (el máximo ``limit`` de ``/suggest``).
+SHORT_PREFIX = 2
+TOP_K = 50
+
+
+class PrefixIndex:
+    """
+    Lista ordenada de sufijos que empiezan en palabra, con frecuencia por valor.
+
+    Parameters
+    ----------
+    values : iterable of str
+        Valores del campo, uno por aparición (las repeticiones suman
+        frecuencia).
+    short_prefix : int
+        Longitud máxima de los prefijos con sugerencias precalculadas.
+    top_k : int
+        Sugerencias que se guardan por prefijo corto.
+    """
+
+    def __init__(self, values: Iterable[str], short_prefix: int = SHORT_PREFIX, top_k: int = TOP_K) -> None:
+        counts = Counter(_WHITESPACE.sub(" ", v).strip() for v in values if v and v.strip())
+        self.values: list[str] = list(counts)
+        self.counts: list[int] = [counts[v] for v in self.values]
+        entries: list[tuple[str, int, int]] = []
+        for n, value in enumerate(self.values):
+            for match in _WORD_START.finditer(value):
+                # Normalizar un sufijo coincide con el sufijo del valor
+                # normalizado salvo en casos raros de ligaduras, así que se
+                # calcula por sufijo.
+                entries.append((normalize_term(value[match.start():]), match.start(), n))
+        entries.sort()
+        self.keys = [e[0] for e in entries]
+        self._entries = [(e[1], e[2]) for e in entries]
+        self.top_k = top_k
+        self._short: dict[str, list[int]] = {}
+        for length in range(1, short_prefix + 1):
+            for key in {k[:length] for k in self.keys if len(k) >= length}:
+                self._short[key] = self._rank(key, top_k)
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def complete(self, prefix: str, limit: int = 10) -> list[tuple[str, int]]:
+        """
+        Devuelve hasta ``limit`` pares ``(valor, frecuencia)`` que contienen una
+        palabra que empieza por ``prefix``.
+
+        Primero los valores que *empiezan* por el prefijo, luego por frecuencia
+        descendente y finalmente en orden alfabético.
+        """
+        key = normalize_term(prefix)
+        if not key:
+            return []
+        short = self._short.get(key)
+        ranked = short[:limit] if short is not None and limit <= self.top_k else self._rank(key, limit)
+        return [(self.values[n], self.counts[n]) for n in ranked]
+
+    def _rank(self, key: str, limit: int) -> list[int]:
+        """Los ``limit`` mejores valores para ``key`` recorriendo su rango."""
+        lo = bisect_left(self.keys, key)
+        hi = bisect_left(self.keys, key + "\U0010ffff", lo)
+        best: dict[int, int] = {}
+        for position, n in self._entries[lo:hi]:
+            if position < best.get(n, position + 1):
+                best[n] = position
+        ranked = heapq.nsmallest(
+            limit, best.items(), key=lambda kv: (kv[1] > 0, -self.counts[kv[0]], self.values[kv[0]].casefold())
+        )
+        return [n for n, _ in ranked]
+
+
+def split_values(value: Optional[str], multivalued: bool) -> list[str]:
+    """Separa las listas separadas por comas de las columnas multivalor."""
+    if not value:
+        return []
+    if not multivalued:
+        return [value]
+    return [p.strip() for p in value.split(",") if p.strip()]
@@ -0,0 +1,161 @@
+"""
+Calentamiento de cachés a partir de las consultas más frecuentes.
+
+:class:`QueryLogMiddleware` registra la *forma* normalizada de cada petición
+``GET`` exitosa (ruta y parámetros ordenados, sin valores vacíos) y cuántas
+veces se vio. Tras el arranque y después de cada cambio del dataset,
+:func:`replay` vuelve a ejecutar las ``top`` formas más frecuentes contra el
+router de la aplicación (sin pasar por los middlewares, así que no cuentan en
+métricas ni ocupan cupos de admisión). Así la caché de páginas de SQLite, los
+conteos y los ítems calientes quedan cargados antes de que llegue el tráfico.
+
+El registro puede persistirse en un archivo JSON para que el conocimiento de
+qué consultas son frecuentes sobreviva a un despliegue.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+from collections import Counter
+from typing import Callable, Optional
+from urllib.parse import parse_qsl, urlencode
+
+from starlette.exceptions import HTTPException
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_query(query_string: str) -> str:
+    """Ordena los parámetros y descarta los vacíos para agrupar consultas equivalentes."""
+    params = [
+        (name, " ".join(value.split()))
+        for name, value in parse_qsl(query_string, keep_blank_values=True)
+        if value.strip()
+    ]
+    return urlencode(sorted(params))
+
+
+class QueryLog:
+    """
+    Frecuencia de formas de consulta ``(ruta, parámetros normalizados)``.
+
+    Parameters
+    ----------
+    max_shapes : int
+        Formas distintas que se conservan. Al superarlo se descarta la mitad
+        menos frecuente, para que los ids o términos vistos una sola vez no
+        hagan crecer el registro sin límite.
+    """
+
+    def __init__(self, max_shapes: int = 5000) -> None:
+        self.max_shapes = max_shapes
+        self.counts: Counter[tuple[str, str]] = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, path: str, query_string: str) -> None:
+        shape = (path, normalize_query(query_string))
+        with self._lock:
+            self.counts[shape] += 1
+            if len(self.counts) > self.max_shapes:
+                self.counts = Counter(dict(self.counts.most_common(self.max_shapes // 2)))
+
+    def top(self, n: int) -> list[tuple[str, str]]:
+        """Las ``n`` formas más frecuentes, de mayor a menor."""
+        with self._lock:
+            return [shape for shape, _ in self.counts.most_common(n)]
+
+    def save(self, path: str) -> None:
+        with self._lock:
+            entries = [[p, q, c] for (p, q), c in self.counts.most_common()]
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as fh:
+            json.dump(entries, fh, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    def load(self, path: str) -> None:
+        """Suma las frecuencias guardadas en ``path``; ignora un archivo inexistente."""
+        try:
+            with open(path, encoding="utf-8") as fh:
+                entries = json.load(fh)
+        except FileNotFoundError:
+            return
+        with self._lock:
+            for p, q, c in entries:
+                self.counts[(p, q)] += c
+
+
+class QueryLogMiddleware:
+    """
+    Middleware ASGI que registra en ``log`` las peticiones ``GET`` con
+    respuesta ``200`` cuyas rutas acepta ``include``.
+    """
+
+    def __init__(self, app: ASGIApp, log: QueryLog, include: Callable[[str], bool]) -> None:
+        self.app = app
+        self.log = log
+        self.include = include
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] != "GET" or not self.include(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+        status_code: Optional[int] = None
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+        if status_code == 200:
+            self.log.record(scope["path"], scope["query_string"].decode("latin-1"))
+
+
+async def replay(app: ASGIApp, shapes: list[tuple[str, str]]) -> int:
+    """
+    Ejecuta cada forma como un ``GET`` contra ``app`` descartando la respuesta.
+
+    Devuelve cuántas respondieron ``200``. Los errores de una consulta se
+    registran y no detienen el resto; los errores HTTP (p.ej. un 404 de un
+    ítem popular que ya no existe) son esperables y se registran sin traza.
+    """
+    ok = 0
+    for path, query in shapes:
+        status_code: Optional[int] = None
+
+        async def receive() -> Message:
+            return {"type": "http.request", "body": b"", "more_body": False}
+
+        async def send(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "root_path": "",
+            "query_string": query.encode(),
+            "headers": [],
+            "client": None,
+            "server": None,
+        }
+        try:
+            await app(scope, receive, send)
+        except HTTPException as exc:
+            logger.info("Calentamiento de %s?%s respondió %s", path, query, exc.status_code)
+            continue
+        except Exception:
+            logger.exception("Error al calentar %s?%s", path, query)
+            continue
+        ok += status_code == 200
+    return ok
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Benchmark de compresión de respuestas de la API.
+
+Mide, para cada codificación disponible (gzip y, si están instalados,
+brotli y zstd) y varios niveles, los bytes enviados por la red y el costo de
+CPU por respuesta sobre cuerpos representativos de ``/items`` y ``/genres``.
+
+Uso::
+
+    python bench_compression.py
+    python bench_compression.py --repeat 200 > bench_output.txt
+
+Los cuerpos se construyen a partir de ``data.db`` si existe (vía ``DB_URL``)
+y, si no, replicando el dataset de respaldo del ETL.
+"""
+import argparse
+import json
+import os
+import sqlite3
+import time
+
+from api.compression import available_encodings, compress
+
+LEVELS = {"gzip": (1, 6, 9), "br": (1, 4, 6), "zstd": (1, 3, 9)}
+
+
+def _load_rows() -> list[dict]:
+    db_url = os.getenv("DB_URL", "sqlite:///./data.db")
+    path = db_url.replace("sqlite:///", "", 1)
+    if os.path.exists(path):
+        conn = sqlite3.connect(path)
+        conn.row_factory = sqlite3.Row
+        try:
+            rows = [dict(r) for r in conn.execute("SELECT * FROM items LIMIT 1000")]
+        finally:
+            conn.close()
+        if rows:
+            return rows
+    from etl.load import _fallback_records
+
+    base = _fallback_records()
+    return [
+        {**rec, "id": f"{rec['id']}-{i}"}
+        for i in range(200)
+        for rec in base
+    ]
+
+
+def _payloads(rows: list[dict]) -> dict[str, bytes]:
+    counts: dict[str, int] = {}
+    for row in rows:
+        for g in (row.get("genre") or "").split(","):
+            if g.strip():
+                counts[g.strip().lower()] = counts.get(g.strip().lower(), 0) + 1
+    genres = [{"name": k, "count": v} for k, v in sorted(counts.items(), key=lambda kv: -kv[1])[:200]]
+    return {
+        "/items?limit=5": json.dumps(rows[:5]).encode(),
+        "/items?limit=20": json.dumps(rows[:20]).encode(),
+        "/items?limit=100": json.dumps(rows[:100]).encode(),
+        "/genres": json.dumps(genres).encode(),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=50, help="Repeticiones por medición")
+    args = parser.parse_args()
+
+    payloads = _payloads(_load_rows())
+    encodings = [e for e in ("gzip", "br", "zstd") if e in available_encodings()]
+    print(f"Codificaciones disponibles: {', '.join(encodings)}")
+    print(f"{'respuesta':<18} {'codif.':<6} {'nivel':>5} {'bytes':>9} {'ratio':>7} {'CPU µs':>9}")
+    for name, body in payloads.items():
+        print(f"{name:<18} {'-':<6} {'-':>5} {len(body):>9} {1.0:>7.2f} {0:>9}")
+        for encoding in encodings:
+            for level in LEVELS[encoding]:
+                start = time.process_time()
+                for _ in range(args.repeat):
+                    out = compress(body, encoding, level)
+                cpu_us = (time.process_time() - start) / args.repeat * 1e6
+                ratio = len(body) / len(out)
+                print(f"{name:<18} {encoding:<6} {level:>5} {len(out):>9} {ratio:>7.2f} {cpu_us:>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Gazetteer local para canonicalizar ubicaciones a códigos de país o región.
+
+La columna ``location`` guarda hasta tres lugares de Open Library separados
+por comas ("Bogotá (Colombia)", "Caribbean Area", "Estados Unidos"...). El
+ETL resuelve cada lugar contra este gazetteer a un código ISO 3166-1 alfa-2
+(``CO``) o, para regiones, a un código M49 de Naciones Unidas (``419``:
+América Latina y el Caribe) y guarda los códigos en ``item_countries``. Un
+país también se asocia a su región, así que ``country=419`` incluye los
+ítems de Colombia o México.
+
+Los nombres se siembran en la tabla ``places`` (ver
+``etl.load.ensure_gazetteer``); si el gazetteer cambia, el ETL la reemplaza y
+recalcula ``item_countries``.
+
+Este módulo no depende del ETL para que la API pueda importarlo al arrancar.
+"""
+from __future__ import annotations
+
+import re
+from typing import Iterable, Mapping, Optional
+
+from etl.vocabulary import normalize_term
+
+# Regiones M49: código -> (nombre, nombres y alias).
+REGIONS: dict[str, tuple[str, tuple[str, ...]]] = {
+    "419": ("América Latina y el Caribe", (
+        "latin america", "américa latina", "latinoamérica", "hispanoamérica", "iberoamérica",
+        "south america", "américa del sur", "sudamérica", "suramérica", "central america",
+        "centroamérica", "caribbean area", "caribbean", "caribe", "andes",
+    )),
+    "150": ("Europa", ("europe", "europa", "western europe", "europa occidental")),
+    "021": ("Norteamérica", ("north america", "norteamérica", "américa del norte")),
+    "142": ("Asia", ("asia", "east asia", "asia oriental")),
+    "002": ("África", ("áfrica",)),
+}
+
+# Países: código -> (nombre, región, alias en español e inglés, incluidas
+# ciudades y regiones frecuentes en los temas de Open Library).
+COUNTRIES: dict[str, tuple[str, str, tuple[str, ...]]] = {
+    "CO": ("Colombia", "419", (
+        "colombia", "república de colombia", "bogotá", "medellín", "cali", "cartagena", "barranquilla",
+        "santa marta", "aracataca", "antioquia", "caribe colombiano", "costa caribe colombiana",
+    )),
+    "MX": ("México", "419", ("méxico", "ciudad de méxico", "mexico city")),
+    "AR": ("Argentina", "419", ("argentina", "buenos aires")),
+    "PE": ("Perú", "419", ("perú", "lima")),
+    "CL": ("Chile", "419", ("chile", "santiago de chile")),
+    "VE": ("Venezuela", "419", ("venezuela", "caracas")),
+    "EC": ("Ecuador", "419", ("ecuador", "quito")),
+    "CU": ("Cuba", "419", ("cuba", "la habana", "havana")),
+    "BR": ("Brasil", "419", ("brazil", "brasil", "rio de janeiro", "são paulo")),
+    "ES": ("España", "150", ("spain", "españa", "madrid", "barcelona", "castilla", "andalucía")),
+    "FR": ("Francia", "150", ("france", "francia", "parís")),
+    "DE": ("Alemania", "150", ("germany", "alemania", "berlín", "prussia", "prusia")),
+    "IT": ("Italia", "150", ("italy", "italia", "rome", "roma")),
+    "PT": ("Portugal", "150", ("portugal", "lisboa", "lisbon")),
+    "GB": ("Reino Unido", "150", (
+        "united kingdom", "reino unido", "great britain", "gran bretaña", "england", "inglaterra",
+        "london", "londres", "scotland", "escocia",
+    )),
+    "RU": ("Rusia", "150", ("russia", "rusia", "soviet union", "unión soviética", "moscow", "moscú")),
+    "US": ("Estados Unidos", "021", (
+        "united states", "estados unidos", "estados unidos de américa", "usa", "eeuu", "ee. uu.",
+        "new york", "nueva york", "california", "maine", "texas",
+    )),
+    "CA": ("Canadá", "021", ("canadá",)),
+    "CN": ("China", "142", ("china", "beijing", "pekín")),
+    "JP": ("Japón", "142", ("japan", "japón", "tokyo", "tokio")),
+    "IN": ("India", "142", ("india",)),
+    "EG": ("Egipto", "002", ("egypt", "egipto")),
+}
+
+
+# Lugar normalizado -> (código, región del código o ``None``), tal como se siembra.
+PLACES: dict[str, tuple[str, Optional[str]]] = {
+    **{normalize_term(term): (code, None) for code, (_, terms) in REGIONS.items() for term in terms},
+    **{normalize_term(term): (code, region) for code, (_, region, terms) in COUNTRIES.items() for term in terms},
+}
+# Código -> nombre para mostrar.
+PLACE_NAMES: dict[str, str] = {
+    **{code: name for code, (name, _) in REGIONS.items()},
+    **{code: name for code, (name, _, _) in COUNTRIES.items()},
+}
+
+_PARENTHESES = re.compile(r"[()]")
+
+
+def canonical_places(
+    location: Optional[str], places: Mapping[str, tuple[str, Optional[str]]] = PLACES,
+) -> list[str]:
+    """
+    Códigos de país y región de ``location``.
+
+    Cada lugar (separado por comas) se busca completo y, si no está, por sus
+    partes: "Bogotá (Colombia)" -> "bogota" y "colombia"; "Colombia -- History"
+    -> "colombia". Los lugares desconocidos se ignoran; el orden es el de
+    aparición, sin duplicados, con la región después de su país.
+    """
+    codes: list[str] = []
+    for place in (location or "").split(","):
+        term = normalize_term(place)
+        parts: Iterable[str] = [term] if term in places else (
+            normalize_term(p) for p in _PARENTHESES.sub("--", term).split("--")
+        )
+        for part in parts:
+            code, region = places.get(part, (None, None))
+            for found in (code, region):
+                if found is not None and found not in codes:
+                    codes.append(found)
+    return codes
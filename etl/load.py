@@ -19,21 +19,37 @@ Variables de entorno
     raíz del proyecto.
 ``OPENLIBRARY_QUERY``:
     Consulta de búsqueda para la API de Open Library. Por defecto ``colombia``.
+``SNAPSHOT_DIR``:
+    Si se define, al terminar la carga se publica ahí un snapshot inmutable
+    de la base para los workers de la API (ver ``etl.snapshot``).
 """
 from __future__ import annotations
 
 import os
 import logging
-import requests
+import re
 import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, delete, func, or_, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.orm import Session
 
-from models_shared import Base, Item
+from models_shared import (
+    Base, DatasetStats, Genre, GenreSynonym, Item, ItemChange, ItemCountry, ItemGenre, Place,
+)
+from etl.shards import partition, shard_count, shard_urls
+from etl.similarity import rebuild_similarity
+from etl.snapshot import publish_snapshot
+from etl.gazetteer import PLACES, canonical_places
+from etl.vocabulary import GENRE_NAMES, SYNONYMS, canonical_genres
+
+if TYPE_CHECKING:
+    import requests
 
 logger = logging.getLogger(__name__)
-logging.basicConfig(level=logging.INFO, format="%(levelname)s:%(name)s:%(message)s")
 
 def _fallback_records() -> list[dict]:
     """
@@ -99,6 +115,10 @@ def _fallback_records() -> list[dict]:
     ]
 
 def _get_with_retries(url: str, params: dict, retries: int = 3, backoff: float = 2.0) -> requests.Response:
+    # ``requests`` se importa al usarse: la API importa este módulo sin
+    # necesitar HTTP y así no paga ese costo al arrancar.
+    import requests
+
     last_exc: Exception | None = None
     for attempt in range(1, retries + 1):
         try:
@@ -111,12 +131,27 @@ def _get_with_retries(url: str, params: dict, retries: int = 3, backoff: float =
     if last_exc:
         raise last_exc
 
+def derive_year(value) -> int | None:
+    """
+    Obtiene un año entero a partir de ``first_publish_year`` o de un ``date``
+    libre (p.ej. ``"1985"``, ``"1985-03-01"`` o ``"c. 1926"``).
+    """
+    if isinstance(value, int):
+        return value
+    if not value:
+        return None
+    match = re.search(r"\b(\d{4})\b", str(value))
+    return int(match.group(1)) if match else None
+
 def ensure_schema(engine) -> None:
     """
     Asegura que el esquema tenga las columnas esperadas.
 
     En SQLite, ``create_all`` no agrega nuevas columnas, así que
-    hacemos una verificación ligera y agregamos ``genre`` si falta.
+    hacemos una verificación ligera y agregamos ``genre`` y ``year`` si
+    faltan. Al agregar ``year`` se crea su índice y se calcula a partir de
+    ``date`` para las filas existentes con :func:`derive_year`, la misma regla
+    que usa la carga.
     """
     try:
         with engine.begin() as conn:
@@ -126,9 +161,77 @@ def ensure_schema(engine) -> None:
                 logging.info("Agregando columna 'genre' a la tabla items...")
                 conn.exec_driver_sql("ALTER TABLE items ADD COLUMN genre VARCHAR")
                 logging.info("Columna 'genre' agregada")
+            if 'year' not in cols:
+                logging.info("Agregando columna 'year' a la tabla items...")
+                conn.exec_driver_sql("ALTER TABLE items ADD COLUMN year INTEGER")
+                conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_items_year ON items (year)")
+                years = [
+                    (year, rowid)
+                    for rowid, date in conn.exec_driver_sql("SELECT rowid, date FROM items WHERE date IS NOT NULL")
+                    if (year := derive_year(date)) is not None
+                ]
+                if years:
+                    conn.exec_driver_sql("UPDATE items SET year = ? WHERE rowid = ?", years)
+                logging.info("Columna 'year' agregada")
     except Exception as exc:
         logging.warning("No se pudo verificar/alterar el esquema: %s", exc)
 
+# Índice de texto completo (FTS5) sobre ``items`` para el orden por relevancia
+# de la API. Es una tabla de contenido externo: no duplica el texto y se
+# mantiene sincronizada mediante triggers.
+SEARCH_INDEX_COLUMNS = ("title", "author", "summary", "genre", "location")
+
+# Ids por consulta ``IN`` al buscar qué registros ya existen.
+EXISTING_CHUNK_SIZE = 500
+
+def ensure_search_index(engine) -> None:
+    """
+    Crea el índice FTS5 ``items_fts`` y sus triggers si no existen.
+
+    La primera vez que se crea, se reconstruye a partir de las filas ya
+    existentes en ``items``. El tokenizador ignora tildes para que
+    "garcia" encuentre "García". Un índice con otras columnas (de una versión
+    anterior de ``SEARCH_INDEX_COLUMNS``) se descarta y se vuelve a crear.
+    """
+    cols = ", ".join(SEARCH_INDEX_COLUMNS)
+    new_cols = ", ".join(f"new.{c}" for c in SEARCH_INDEX_COLUMNS)
+    old_cols = ", ".join(f"old.{c}" for c in SEARCH_INDEX_COLUMNS)
+    try:
+        with engine.begin() as conn:
+            exists = conn.exec_driver_sql(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'items_fts'"
+            ).first()
+            if exists:
+                indexed = tuple(row[1] for row in conn.exec_driver_sql("PRAGMA table_info(items_fts)"))
+                if indexed == SEARCH_INDEX_COLUMNS:
+                    return
+                logging.info("Recreando índice de búsqueda 'items_fts' con %s", cols)
+                for trigger in ("items_fts_ai", "items_fts_ad", "items_fts_au"):
+                    conn.exec_driver_sql(f"DROP TRIGGER IF EXISTS {trigger}")
+                conn.exec_driver_sql("DROP TABLE items_fts")
+            logging.info("Creando índice de búsqueda 'items_fts'...")
+            conn.exec_driver_sql(
+                f"CREATE VIRTUAL TABLE items_fts USING fts5({cols}, content='items', "
+                "content_rowid='rowid', tokenize='unicode61 remove_diacritics 2')"
+            )
+            conn.exec_driver_sql(
+                f"CREATE TRIGGER items_fts_ai AFTER INSERT ON items BEGIN "
+                f"INSERT INTO items_fts(rowid, {cols}) VALUES (new.rowid, {new_cols}); END"
+            )
+            conn.exec_driver_sql(
+                f"CREATE TRIGGER items_fts_ad AFTER DELETE ON items BEGIN "
+                f"INSERT INTO items_fts(items_fts, rowid, {cols}) VALUES ('delete', old.rowid, {old_cols}); END"
+            )
+            conn.exec_driver_sql(
+                f"CREATE TRIGGER items_fts_au AFTER UPDATE ON items BEGIN "
+                f"INSERT INTO items_fts(items_fts, rowid, {cols}) VALUES ('delete', old.rowid, {old_cols}); "
+                f"INSERT INTO items_fts(rowid, {cols}) VALUES (new.rowid, {new_cols}); END"
+            )
+            conn.exec_driver_sql("INSERT INTO items_fts(items_fts) VALUES ('rebuild')")
+            logging.info("Índice de búsqueda creado")
+    except Exception as exc:
+        logging.warning("No se pudo crear el índice de búsqueda: %s", exc)
+
 def fetch_records() -> list[dict]:
     """
     Obtiene registros de una API pública externa.
@@ -168,7 +271,7 @@ def fetch_records() -> list[dict]:
         title = doc.get("title") or "Untitled"
         # Extract optional fields
         date = None
-        year = doc.get("first_publish_year")
+        year = derive_year(doc.get("first_publish_year"))
         if year:
             date = str(year)
         authors = doc.get("author_name")
@@ -210,6 +313,7 @@ def fetch_records() -> list[dict]:
                 "summary": summary,
                 "source_url": source_url,
                 "genre": genre,
+                "year": year,
             }
         )
     logger.info("Se obtuvieron %s registros", len(items))
@@ -233,6 +337,8 @@ def enrich_missing_genres(items: list[dict], max_enrich: int = 20) -> None:
             continue
         url = f"https://openlibrary.org/{rec_id}.json"
         try:
+            import requests
+
             r = requests.get(url, timeout=10)
             if r.status_code == 200:
                 data = r.json()
@@ -243,20 +349,206 @@ def enrich_missing_genres(items: list[dict], max_enrich: int = 20) -> None:
         except Exception as exc:
             logger.debug("No se pudo enriquecer %s: %s", rec_id, exc)
 
+def update_dataset_stats(session: Session, item_count: int | None = None) -> DatasetStats:
+    """
+    Incrementa la versión del dataset y recalcula el conteo de ítems.
+
+    Debe llamarse dentro de la misma transacción que la carga para que la
+    versión y los datos cambien juntos. Con shards, ``item_count`` es la suma
+    de los conteos de cada shard.
+    """
+    stats = session.get(DatasetStats, 1)
+    if stats is None:
+        stats = DatasetStats(id=1, version=0, item_count=0)
+        session.add(stats)
+    stats.version += 1
+    if item_count is None:
+        item_count = session.scalar(select(func.count()).select_from(Item)) or 0
+    stats.item_count = item_count
+    stats.refreshed_at = datetime.now(timezone.utc).isoformat(timespec="seconds")
+    return stats
+
+def prepare_database(engine) -> None:
+    """Crea las tablas, columnas, índice de búsqueda, vocabulario y gazetteer que falten."""
+    Base.metadata.create_all(engine)
+    # Asegurar columnas nuevas (p.ej., genre)
+    ensure_schema(engine)
+    ensure_search_index(engine)
+    ensure_vocabulary(engine)
+    ensure_gazetteer(engine)
+
+def ensure_vocabulary(engine) -> None:
+    """
+    Siembra el vocabulario de géneros (``etl.vocabulary``) en ``genres`` y
+    ``genre_synonyms``.
+
+    Si el vocabulario guardado difiere del actual, se reemplaza y se
+    recalcula ``item_genres`` para todas las filas existentes.
+    """
+    with Session(engine) as session:
+        names = dict(session.execute(select(Genre.id, Genre.name)).all())
+        synonyms = dict(session.execute(select(GenreSynonym.term, GenreSynonym.genre_id)).all())
+        if names == GENRE_NAMES and synonyms == SYNONYMS:
+            return
+        logger.info("Sembrando vocabulario de géneros (%s géneros, %s sinónimos)", len(GENRE_NAMES), len(SYNONYMS))
+        session.execute(delete(Genre))
+        session.execute(delete(GenreSynonym))
+        session.execute(delete(ItemGenre))
+        session.execute(Genre.__table__.insert(), [{"id": i, "name": n} for i, n in GENRE_NAMES.items()])
+        session.execute(
+            GenreSynonym.__table__.insert(), [{"term": t, "genre_id": i} for t, i in SYNONYMS.items()]
+        )
+        link_genres(session, session.execute(select(Item.id, Item.genre)).all())
+        session.commit()
+
+def link_genres(session: Session, rows) -> None:
+    """
+    Reemplaza los géneros canónicos de ``rows`` (pares ``(id, genre)``) en
+    ``item_genres``.
+    """
+    rows = list(rows)
+    ids = [item_id for item_id, _ in rows]
+    for start in range(0, len(ids), EXISTING_CHUNK_SIZE):
+        session.execute(delete(ItemGenre).where(ItemGenre.item_id.in_(ids[start:start + EXISTING_CHUNK_SIZE])))
+    links = [
+        {"item_id": item_id, "genre_id": genre_id}
+        for item_id, subjects in rows
+        for genre_id in canonical_genres(subjects)
+    ]
+    if links:
+        session.execute(ItemGenre.__table__.insert(), links)
+
+def ensure_gazetteer(engine) -> None:
+    """
+    Siembra el gazetteer (``etl.gazetteer``) en ``places``.
+
+    Si el gazetteer guardado difiere del actual, se reemplaza y se recalcula
+    ``item_countries`` para todas las filas existentes.
+    """
+    with Session(engine) as session:
+        rows = session.execute(select(Place.term, Place.code, Place.region))
+        stored = {term: (code, region) for term, code, region in rows}
+        if stored == PLACES:
+            return
+        logger.info("Sembrando gazetteer (%s lugares)", len(PLACES))
+        session.execute(delete(Place))
+        session.execute(delete(ItemCountry))
+        session.execute(
+            Place.__table__.insert(),
+            [{"term": term, "code": code, "region": region} for term, (code, region) in PLACES.items()],
+        )
+        link_countries(session, session.execute(select(Item.id, Item.location)).all())
+        session.commit()
+
+def link_countries(session: Session, rows) -> None:
+    """
+    Reemplaza los códigos de país y región de ``rows`` (pares
+    ``(id, location)``) en ``item_countries``.
+    """
+    rows = list(rows)
+    ids = [item_id for item_id, _ in rows]
+    for start in range(0, len(ids), EXISTING_CHUNK_SIZE):
+        session.execute(delete(ItemCountry).where(ItemCountry.item_id.in_(ids[start:start + EXISTING_CHUNK_SIZE])))
+    links = [
+        {"item_id": item_id, "code": code}
+        for item_id, location in rows
+        for code in canonical_places(location)
+    ]
+    if links:
+        session.execute(ItemCountry.__table__.insert(), links)
+
+def upsert_items(session: Session, records: list[dict]) -> list[tuple[str, str]]:
+    """
+    Inserta o reemplaza ``records`` en ``items`` con un único
+    ``INSERT ... ON CONFLICT(id) DO UPDATE`` ejecutado en lote.
+
+    Cada registro reemplaza la fila completa: las columnas ausentes quedan en
+    ``NULL``. Si falta ``year`` se deriva de ``date``. Las filas idénticas a
+    las guardadas no se reescriben (ni disparan los triggers de
+    ``items_fts``). Los géneros canónicos y los países de las filas que
+    cambian se recalculan en ``item_genres`` e ``item_countries``.
+
+    Returns
+    -------
+    list[tuple[str, str]]
+        Pares ``(id, op)`` de las filas que realmente cambiaron, con ``op``
+        igual a ``insert`` o ``update``; ver :func:`log_changes`.
+    """
+    if not records:
+        return []
+    columns = Item.__table__.columns.keys()
+    rows = {}
+    for record in records:
+        row = {c: record.get(c) for c in columns}
+        if row["year"] is None:
+            row["year"] = derive_year(row["date"])
+        # Si un id se repite en el lote, gana el último registro.
+        rows[row["id"]] = row
+    ids = list(rows)
+    existing = set()
+    for start in range(0, len(ids), EXISTING_CHUNK_SIZE):
+        existing.update(session.scalars(select(Item.id).where(Item.id.in_(ids[start:start + EXISTING_CHUNK_SIZE]))))
+    stmt = sqlite_insert(Item.__table__)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[Item.id],
+        set_={c: stmt.excluded[c] for c in columns if c != "id"},
+        where=or_(*[Item.__table__.c[c].is_distinct_from(stmt.excluded[c]) for c in columns if c != "id"]),
+    ).returning(Item.id)
+    changed = set(session.scalars(stmt, list(rows.values())))
+    link_genres(session, [(i, rows[i]["genre"]) for i in ids if i in changed])
+    link_countries(session, [(i, rows[i]["location"]) for i in ids if i in changed])
+    return [(i, "update" if i in existing else "insert") for i in ids if i in changed]
+
+def log_changes(session: Session, changes: list[tuple[str, str]]) -> None:
+    """
+    Agrega ``changes`` a la bitácora ``item_changes`` de la base principal.
+
+    Se registran con la versión que publicará el próximo
+    :func:`update_dataset_stats` de la misma transacción.
+    """
+    if not changes:
+        return
+    version = (session.scalar(select(DatasetStats.version).where(DatasetStats.id == 1)) or 0) + 1
+    session.execute(
+        ItemChange.__table__.insert(),
+        [{"item_id": item_id, "op": op, "version": version} for item_id, op in changes],
+    )
+
+def load_shards(engines: list, records: list[dict]) -> tuple[list[int], list[tuple[str, str]]]:
+    """
+    Reparte ``records`` por id entre ``engines`` y los carga en paralelo, cada
+    shard en su propia transacción. Devuelve el conteo de ítems de cada shard
+    y los cambios de todos ellos, que se registran en la base principal.
+    """
+    def load(engine, part: list[dict]) -> tuple[int, list[tuple[str, str]]]:
+        with Session(engine) as session:
+            changes = upsert_items(session, part)
+            count = session.scalar(select(func.count()).select_from(Item)) or 0
+            session.commit()
+        return count, changes
+
+    with ThreadPoolExecutor(max_workers=len(engines)) as pool:
+        results = list(pool.map(load, engines, partition(records, len(engines))))
+    return [count for count, _ in results], [change for _, changes in results for change in changes]
+
+def shard_rows(engines: list, *columns):
+    """Recorre ``columns`` de ``items`` en todos los shards, uno tras otro."""
+    for engine in engines:
+        with Session(engine) as session:
+            yield from session.execute(select(*columns).execution_options(yield_per=1000))
+
 def run() -> None:
     """
     Ejecuta todo el pipeline de extracción-transformación-carga.
 
     - Obtiene registros de la API externa.
     - Crea el esquema de base de datos si no existe.
-    - Inserta o actualiza cada registro en la tabla ``items``.
+    - Inserta o actualiza cada registro en la tabla ``items`` y registra los
+      cambios en ``item_changes``.
     """
     db_url = os.getenv("DB_URL", "sqlite:///./data.db")
     engine = create_engine(db_url, future=True)
-    # Crear tablas si no existen
-    Base.metadata.create_all(engine)
-    # Asegurar columnas nuevas (p.ej., genre)
-    ensure_schema(engine)
+    prepare_database(engine)
     records = fetch_records()
     # Enriquecer géneros faltantes con un número limitado de requests
     if records:
@@ -264,12 +556,33 @@ def run() -> None:
     if not records:
         logger.warning("No se obtuvieron registros; omitiendo carga.")
         return
-    with Session(engine) as session:
-        for record in records:
-            # Usar merge para insertar/actualizar basado en clave primaria.
-            session.merge(Item(**record))
-        session.commit()
-    logger.info("Se cargaron %s registros en la base de datos", len(records))
+    shards = shard_count()
+    if shards > 1:
+        shard_engines = [create_engine(url, future=True) for url in shard_urls(db_url, shards)]
+        for shard_engine in shard_engines:
+            prepare_database(shard_engine)
+        counts, changes = load_shards(shard_engines, records)
+        with Session(engine) as session:
+            log_changes(session, changes)
+            rows = shard_rows(shard_engines, Item.id, Item.author, Item.genre, Item.title)
+            rebuild_similarity(session, rows)
+            update_dataset_stats(session, item_count=sum(counts))
+            session.commit()
+        logger.info("Se cargaron %s registros en %s shards", len(records), shards)
+    else:
+        with Session(engine) as session:
+            log_changes(session, upsert_items(session, records))
+            session.flush()
+            rebuild_similarity(session)
+            update_dataset_stats(session)
+            session.commit()
+        logger.info("Se cargaron %s registros en la base de datos", len(records))
+    # Con shards el snapshot cubre la base global; la API sigue leyendo los
+    # shards directamente, igual que tras una ingesta por ``/admin/items``.
+    snapshot_dir = os.getenv("SNAPSHOT_DIR")
+    if snapshot_dir:
+        publish_snapshot(db_url, snapshot_dir)
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s:%(name)s:%(message)s")
     run()
\ No newline at end of file
@@ -0,0 +1,57 @@
+"""
+Particionado opcional de ``items`` en varios archivos SQLite.
+
+Con ``SHARD_COUNT`` mayor que 1, cada ítem vive en el shard
+``shard_index(id, SHARD_COUNT)``: un hash estable del id (igual en todos los
+procesos, a diferencia de ``hash()``). La base de ``DB_URL`` sigue guardando
+las tablas globales (``dataset_stats``, ``item_changes``, ``item_similarity``
+y los vocabularios ``genres``, ``genre_synonyms`` y ``places``). Cada shard
+guarda sus ``items`` con su índice de búsqueda y las tablas asociadas a esos
+ítems (``item_genres``, ``item_countries``), para filtrar sin salir del shard.
+Todas las bases se crean con el mismo esquema y los mismos vocabularios.
+
+Las URLs de los shards se derivan de ``DB_URL`` (``data.db`` ->
+``data.shard0.db``, ``data.shard1.db``, ...) o se indican explícitamente en
+``SHARD_URLS`` separadas por comas.
+
+Este módulo no depende del ETL para que la API pueda importarlo al arrancar.
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+from typing import Iterable, Optional
+
+
+def shard_count() -> int:
+    """Número de shards configurado; 0 o 1 significa una sola base de datos."""
+    urls = os.getenv("SHARD_URLS")
+    if urls:
+        return len([u for u in urls.split(",") if u.strip()])
+    return int(os.getenv("SHARD_COUNT", "0"))
+
+
+def shard_index(item_id: str, count: int) -> int:
+    """Shard al que pertenece ``item_id`` entre ``count`` shards."""
+    if count <= 1:
+        return 0
+    digest = hashlib.blake2b(item_id.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "little") % count
+
+
+def shard_urls(db_url: str, count: Optional[int] = None) -> list[str]:
+    """URLs SQLAlchemy de los shards derivadas de ``db_url`` (o de ``SHARD_URLS``)."""
+    urls = os.getenv("SHARD_URLS")
+    if urls:
+        return [u.strip() for u in urls.split(",") if u.strip()]
+    count = shard_count() if count is None else count
+    base, ext = os.path.splitext(db_url)
+    return [f"{base}.shard{i}{ext or '.db'}" for i in range(count)]
+
+
+def partition(records: Iterable[dict], count: int) -> list[list[dict]]:
+    """Reparte ``records`` por shard según su ``id``."""
+    parts: list[list[dict]] = [[] for _ in range(max(count, 1))]
+    for record in records:
+        parts[shard_index(record["id"], count)].append(record)
+    return parts
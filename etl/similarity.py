@@ -0,0 +1,200 @@
+"""
+Índice de ítems similares calculado durante la carga del ETL.
+
+Cada ítem se representa como un vector disperso de rasgos: sus géneros
+(``g:``), sus autores (``a:``) y las palabras significativas de su título
+(``t:``). Cada rasgo pesa según su tipo y su rareza (IDF), y los vectores se
+normalizan para que el producto punto sea la similitud coseno.
+
+Los productos punto se acumulan recorriendo un índice invertido
+``rasgo -> ítems``, así que sólo se comparan ítems que comparten algún
+rasgo. Los rasgos presentes en más de ``MAX_POSTINGS`` ítems se omiten: casi
+no distinguen y harían el cálculo cuadrático. Para cada ítem se guardan sus
+``TOP_K`` vecinos en la tabla ``item_similarity``.
+
+``rebuild_similarity`` recalcula la tabla entera (ETL). ``refresh_similarity``
+sólo recalcula los ítems afectados por una ingesta: los modificados y los que
+comparten algún rasgo con ellos o los tenían como vecinos. Los pesos IDF se
+recalculan con todo el catálogo, pero las listas de los ítems no afectados se
+conservan y pueden quedar algo desfasadas hasta la siguiente reconstrucción.
+"""
+from __future__ import annotations
+
+import heapq
+import logging
+import math
+import re
+from collections import defaultdict
+from typing import Iterable, Optional
+
+from sqlalchemy import delete, insert, select
+from sqlalchemy.orm import Session
+
+from models_shared import Item, ItemSimilarity
+
+logger = logging.getLogger(__name__)
+
+TOP_K = 10
+MAX_POSTINGS = 2000
+INSERT_BATCH_SIZE = 5000
+# Ids por cláusula ``IN`` (SQLite limita los parámetros por sentencia).
+CHUNK_SIZE = 500
+FEATURE_WEIGHTS = {"g": 3.0, "a": 2.0, "t": 1.0}
+
+_WORD = re.compile(r"\w+")
+# Palabras frecuentes en títulos que no aportan similitud.
+STOPWORDS = frozenset(
+    "de del la las los el en y una uno para por con sin sobre the of and for with from".split()
+)
+
+
+def item_features(author: Optional[str], genre: Optional[str], title: Optional[str]) -> set[str]:
+    """Rasgos de un ítem, con el prefijo de su tipo (``g:``, ``a:``, ``t:``)."""
+    features = {f"g:{g.strip().lower()}" for g in (genre or "").split(",") if g.strip()}
+    features |= {f"a:{a.strip().lower()}" for a in (author or "").split(",") if a.strip()}
+    features |= {
+        f"t:{w}" for w in _WORD.findall((title or "").lower())
+        if len(w) > 3 and w not in STOPWORDS and not w.isdigit()
+    }
+    return features
+
+
+def weighted_vectors(items: dict[str, set[str]]) -> dict[str, dict[str, float]]:
+    """Pondera los rasgos por tipo e IDF y normaliza cada vector (norma L2 = 1)."""
+    df: dict[str, int] = defaultdict(int)
+    for features in items.values():
+        for f in features:
+            df[f] += 1
+    total = len(items)
+    vectors = {}
+    for item_id, features in items.items():
+        vector = {f: FEATURE_WEIGHTS[f[0]] * math.log(1 + total / df[f]) for f in features}
+        norm = math.sqrt(sum(w * w for w in vector.values()))
+        if norm:
+            vectors[item_id] = {f: w / norm for f, w in vector.items()}
+    return vectors
+
+
+def item_vectors(session: Session, rows: Optional[Iterable[tuple]] = None) -> dict[str, dict[str, float]]:
+    """
+    Vectores ponderados de todo el catálogo.
+
+    ``rows`` son tuplas ``(id, author, genre, title)``; por defecto se leen de
+    la tabla ``items`` de ``session`` (con shards, el llamador las reúne).
+    """
+    if rows is None:
+        rows = session.execute(select(Item.id, Item.author, Item.genre, Item.title))
+    return weighted_vectors({
+        item_id: item_features(author, genre, title) for item_id, author, genre, title in rows
+    })
+
+
+def _postings(vectors: dict[str, dict[str, float]]) -> dict[str, list[tuple[str, float]]]:
+    postings: dict[str, list[tuple[str, float]]] = defaultdict(list)
+    for item_id, vector in vectors.items():
+        for f, w in vector.items():
+            postings[f].append((item_id, w))
+    return postings
+
+
+def nearest_neighbors(
+    vectors: dict[str, dict[str, float]],
+    top_k: int = TOP_K,
+    items: Optional[Iterable[str]] = None,
+    postings: Optional[dict[str, list[tuple[str, float]]]] = None,
+) -> Iterable[tuple[str, list[tuple[str, float]]]]:
+    """
+    Genera ``(item_id, [(vecino, similitud), ...])`` por cada ítem de
+    ``items`` (por defecto, todos los de ``vectors``).
+    """
+    if postings is None:
+        postings = _postings(vectors)
+    for item_id in vectors if items is None else items:
+        vector = vectors.get(item_id)
+        if vector is None:
+            continue
+        scores: dict[str, float] = defaultdict(float)
+        for f, w in vector.items():
+            plist = postings[f]
+            if len(plist) > MAX_POSTINGS:
+                continue
+            for other, other_w in plist:
+                if other != item_id:
+                    scores[other] += w * other_w
+        # Desempate por id para que el resultado sea estable entre cargas.
+        best = heapq.nsmallest(top_k, scores.items(), key=lambda kv: (-kv[1], kv[0]))
+        yield item_id, best
+
+
+def _store_neighbors(session: Session, neighbors: Iterable[tuple[str, list[tuple[str, float]]]]) -> int:
+    batch: list[dict] = []
+    stored = 0
+    for item_id, best in neighbors:
+        batch.extend(
+            {"item_id": item_id, "rank": rank, "similar_id": other, "score": round(score, 6)}
+            for rank, (other, score) in enumerate(best, start=1)
+        )
+        if len(batch) >= INSERT_BATCH_SIZE:
+            session.execute(insert(ItemSimilarity), batch)
+            stored += len(batch)
+            batch = []
+    if batch:
+        session.execute(insert(ItemSimilarity), batch)
+        stored += len(batch)
+    return stored
+
+
+def rebuild_similarity(session: Session, rows: Optional[Iterable[tuple]] = None, top_k: int = TOP_K) -> int:
+    """
+    Recalcula ``item_similarity`` dentro de la transacción de ``session``.
+    Devuelve el número de pares guardados.
+
+    ``rows`` son tuplas ``(id, author, genre, title)``; por defecto se leen de
+    la tabla ``items`` de ``session`` (con shards, el llamador las reúne).
+    """
+    vectors = item_vectors(session, rows)
+    session.execute(delete(ItemSimilarity))
+    stored = _store_neighbors(session, nearest_neighbors(vectors, top_k))
+    logger.info("Índice de similitud: %s pares para %s ítems", stored, len(vectors))
+    return stored
+
+
+def refresh_similarity(
+    session: Session,
+    touched: Iterable[str],
+    rows: Optional[Iterable[tuple]] = None,
+    top_k: int = TOP_K,
+) -> int:
+    """
+    Recalcula ``item_similarity`` sólo para los ítems afectados por ``touched``
+    (ids insertados o modificados). Devuelve el número de pares guardados.
+
+    Son afectados los propios ``touched``, los ítems que comparten con ellos
+    algún rasgo distintivo (pueden ganarlos como vecinos) y los que ya los
+    tenían como vecinos (pueden perderlos). Leer los vectores sigue siendo
+    lineal en el catálogo, pero la búsqueda de vecinos y las escrituras se
+    limitan a los afectados.
+    """
+    touched = set(touched)
+    if not touched:
+        return 0
+    vectors = item_vectors(session, rows)
+    postings = _postings(vectors)
+    affected = set(touched)
+    for item_id in touched:
+        for f in vectors.get(item_id, ()):
+            plist = postings[f]
+            if len(plist) <= MAX_POSTINGS:
+                affected.update(other for other, _ in plist)
+    ids = sorted(touched)
+    for start in range(0, len(ids), CHUNK_SIZE):
+        chunk = ids[start:start + CHUNK_SIZE]
+        affected.update(session.scalars(
+            select(ItemSimilarity.item_id).where(ItemSimilarity.similar_id.in_(chunk))
+        ))
+    ids = sorted(affected)
+    for start in range(0, len(ids), CHUNK_SIZE):
+        session.execute(delete(ItemSimilarity).where(ItemSimilarity.item_id.in_(ids[start:start + CHUNK_SIZE])))
+    stored = _store_neighbors(session, nearest_neighbors(vectors, top_k, ids, postings))
+    logger.info("Índice de similitud: %s pares para %s ítems afectados", stored, len(ids))
+    return stored
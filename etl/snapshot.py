@@ -0,0 +1,100 @@
+"""
+Publicación de snapshots inmutables de la base de datos para la API.
+
+El ETL escribe sobre la base de ``DB_URL`` y, al terminar, copia su estado
+con la API de backup de SQLite a un archivo nuevo dentro de ``SNAPSHOT_DIR``.
+Luego reemplaza de forma atómica (``os.replace``) el archivo puntero
+``CURRENT`` con el nombre del snapshot. Los workers de la API abren el
+snapshot vigente en modo sólo lectura (``mode=ro&immutable=1``), sin tomar
+candados, y lo reabren cuando cambia el puntero.
+
+Para publicar manualmente un snapshot::
+
+    python -m etl.snapshot
+"""
+from __future__ import annotations
+
+import logging
+import os
+import sqlite3
+import time
+from pathlib import Path
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+POINTER_FILE = "CURRENT"
+SNAPSHOT_PREFIX = "snapshot-"
+
+
+def sqlite_path(db_url: str) -> str:
+    """Ruta del archivo de una URL ``sqlite:///...``."""
+    if not db_url.startswith("sqlite:///"):
+        raise ValueError(f"Los snapshots requieren una base SQLite en archivo: {db_url}")
+    return db_url[len("sqlite:///"):]
+
+
+def current_snapshot(snapshot_dir: str) -> Optional[str]:
+    """Ruta del snapshot publicado en ``snapshot_dir``, o ``None`` si no hay."""
+    try:
+        with open(os.path.join(snapshot_dir, POINTER_FILE), encoding="utf-8") as fh:
+            name = fh.read().strip()
+    except FileNotFoundError:
+        return None
+    path = os.path.join(snapshot_dir, name)
+    return path if name and os.path.exists(path) else None
+
+
+def snapshot_url(path: str) -> str:
+    """
+    URL SQLAlchemy de sólo lectura e inmutable para ``path``.
+
+    La ruta va codificada (``as_uri``) para que espacios, ``?`` o ``#`` en
+    ``SNAPSHOT_DIR`` no se confundan con los parámetros de la URI.
+    """
+    return f"sqlite:///{Path(path).resolve().as_uri()}?mode=ro&immutable=1&uri=true"
+
+
+def publish_snapshot(db_url: str, snapshot_dir: str, keep: int = 3) -> str:
+    """
+    Copia la base de ``db_url`` a un snapshot nuevo y lo publica.
+
+    La copia se hace a un archivo temporal y se renombra, y después se
+    reemplaza el puntero, así que un lector nunca ve un snapshot a medias.
+    Se conservan los ``keep`` snapshots más recientes; en POSIX los workers
+    que aún tengan abierto uno borrado siguen leyéndolo sin problema.
+    """
+    os.makedirs(snapshot_dir, exist_ok=True)
+    name = f"{SNAPSHOT_PREFIX}{time.time_ns()}.db"
+    path = os.path.join(snapshot_dir, name)
+    source = sqlite3.connect(sqlite_path(db_url))
+    target = sqlite3.connect(path + ".tmp")
+    try:
+        source.backup(target)
+    finally:
+        target.close()
+        source.close()
+    os.replace(path + ".tmp", path)
+
+    pointer = os.path.join(snapshot_dir, POINTER_FILE)
+    with open(pointer + ".tmp", "w", encoding="utf-8") as fh:
+        fh.write(name)
+        fh.flush()
+        os.fsync(fh.fileno())
+    os.replace(pointer + ".tmp", pointer)
+    logger.info("Snapshot publicado: %s", path)
+
+    snapshots = sorted(
+        f for f in os.listdir(snapshot_dir) if f.startswith(SNAPSHOT_PREFIX) and f.endswith(".db")
+    )
+    for old in snapshots[:-keep]:
+        try:
+            os.remove(os.path.join(snapshot_dir, old))
+        except OSError as exc:
+            logger.debug("No se pudo borrar el snapshot %s: %s", old, exc)
+    return path
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s:%(name)s:%(message)s")
+    publish_snapshot(os.getenv("DB_URL", "sqlite:///./data.db"), os.getenv("SNAPSHOT_DIR", "./snapshots"))
@@ -0,0 +1,81 @@
+"""
+Vocabulario controlado de géneros con sinónimos en español e inglés.
+
+Los temas de Open Library son texto libre ("Horror fiction", "Terror",
+"Fiction -- Horror"...). El ETL los canonicaliza contra este vocabulario y
+guarda los géneros resultantes en ``item_genres``; el vocabulario mismo se
+siembra en las tablas ``genres`` y ``genre_synonyms``. Así la API resuelve
+cualquier sinónimo con una búsqueda exacta y filtra por un índice en lugar de
+``ilike`` sobre la columna ``genre``.
+
+El id de cada género es su posición en :data:`GENRES` (empezando en 1): los
+géneros nuevos se agregan al final. Si el vocabulario cambia, el ETL lo
+vuelve a sembrar y recalcula ``item_genres`` (ver
+``etl.load.ensure_vocabulary``).
+
+Este módulo no depende del ETL para que la API pueda importarlo al arrancar.
+"""
+from __future__ import annotations
+
+import unicodedata
+from typing import Iterable, Mapping, Optional
+
+# (nombre canónico, sinónimos). El nombre también cuenta como sinónimo.
+GENRES: list[tuple[str, tuple[str, ...]]] = [
+    ("fiction", ("ficción", "literary fiction", "general fiction")),
+    ("horror", ("terror", "horror fiction", "horror tales", "horror stories", "novela de terror",
+                "cuentos de terror", "ficción de terror")),
+    ("science fiction", ("ciencia ficción", "sci-fi", "ficción científica", "science fiction stories")),
+    ("fantasy", ("fantasía", "fantasy fiction", "ficción fantástica", "fantasía épica")),
+    ("romance", ("romantic fiction", "love stories", "novela romántica", "romántica", "historias de amor")),
+    ("crime", ("crimen", "crimes", "crime fiction", "policíaca", "novela policíaca", "novela negra")),
+    ("mystery", ("misterio", "mystery fiction", "detective and mystery stories", "suspense")),
+    ("history", ("historia", "historical", "world history", "historia universal")),
+    ("biography", ("biografía", "biographies", "biografías", "autobiography", "autobiografía")),
+    ("art", ("arte", "arts", "artes", "fine arts", "bellas artes")),
+    ("philosophy", ("filosofía",)),
+    ("economics", ("economía", "economy")),
+    ("physics", ("física",)),
+    ("poetry", ("poesía", "poems", "poemas")),
+    ("drama", ("teatro", "plays", "obras de teatro")),
+    ("politics", ("política", "political science", "ciencia política")),
+    ("magical realism", ("realismo mágico",)),
+    ("children's literature", ("juvenile fiction", "juvenile literature", "children's fiction",
+                               "literatura infantil", "literatura juvenil")),
+]
+
+
+def normalize_term(text: str) -> str:
+    """Quita tildes, pasa a minúsculas (``casefold``) y colapsa los espacios."""
+    decomposed = unicodedata.normalize("NFKD", text)
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return " ".join(stripped.casefold().split())
+
+
+# id -> nombre canónico y sinónimo normalizado -> id, tal como se siembran.
+GENRE_NAMES: dict[int, str] = {n: name for n, (name, _) in enumerate(GENRES, start=1)}
+SYNONYMS: dict[str, int] = {
+    normalize_term(term): n
+    for n, (name, terms) in enumerate(GENRES, start=1)
+    for term in (name, *terms)
+}
+
+
+def canonical_genres(subjects: Optional[str], synonyms: Mapping[str, int] = SYNONYMS) -> list[int]:
+    """
+    Ids de los géneros del vocabulario presentes en ``subjects``.
+
+    ``subjects`` es la lista separada por comas de la columna ``genre``. Cada
+    tema se busca completo y, si no está, por sus subdivisiones
+    ("Colombia -- History" -> "history"). Los temas fuera del vocabulario se
+    ignoran; el orden es el de aparición, sin duplicados.
+    """
+    ids: list[int] = []
+    for subject in (subjects or "").split(","):
+        term = normalize_term(subject)
+        parts: Iterable[str] = [term] if term in synonyms else (normalize_term(p) for p in term.split("--"))
+        for part in parts:
+            genre_id = synonyms.get(part)
+            if genre_id is not None and genre_id not in ids:
+                ids.append(genre_id)
+    return ids
@@ -10,7 +10,7 @@ se mantenga consistente a través del proyecto.
 from __future__ import annotations
 
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
-from sqlalchemy import String, Text
+from sqlalchemy import Float, Index, Integer, String, Text
 
 class Base(DeclarativeBase):
     """Clase base para todos los modelos declarativos."""
@@ -41,6 +41,9 @@ class Item(Base):
         Original URL to the item in the source system.
     genre : str | None
         A comma-separated list of subjects/genres for the item, if available.
+    year : int | None
+        Publication year derived by the ETL from ``first_publish_year`` or
+        ``date``; indexed so the API can filter by year ranges.
     """
     __tablename__ = "items"
 
@@ -53,9 +56,205 @@ class Item(Base):
     summary: Mapped[str | None] = mapped_column(Text)
     source_url: Mapped[str | None] = mapped_column(String)
     genre: Mapped[str | None] = mapped_column(String, index=True)
+    year: Mapped[int | None] = mapped_column(Integer, index=True)
 
     def __repr__(self) -> str:
         return (
             f"<Item id={self.id!r} title={self.title!r} date={self.date!r} "
             f"author={self.author!r} genre={self.genre!r}>"
-        )
\ No newline at end of file
+        )
+
+class DatasetStats(Base):
+    """
+    Estadísticas del conjunto de datos mantenidas por el ETL.
+
+    La tabla tiene una única fila (``id = 1``) que se actualiza al final de
+    cada carga.
+
+    Attributes
+    ----------
+    version : int
+        Versión del dataset; se incrementa en cada carga. La API la usa para
+        invalidar sus cachés.
+    item_count : int
+        Número de filas de ``items`` al terminar la última carga.
+    refreshed_at : str | None
+        Fecha y hora (ISO 8601, UTC) de la última carga.
+    """
+    __tablename__ = "dataset_stats"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    version: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    item_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    refreshed_at: Mapped[str | None] = mapped_column(String)
+
+    def __repr__(self) -> str:
+        return f"<DatasetStats version={self.version!r} item_count={self.item_count!r}>"
+
+class ItemSimilarity(Base):
+    """
+    Vecinos más similares de cada ítem, precalculados por el ETL.
+
+    Cada ítem guarda sus ``top_k`` vecinos ordenados por ``rank`` (1 = más
+    similar), de modo que la API los obtiene con una búsqueda por clave
+    primaria (ver ``etl.similarity``).
+
+    Attributes
+    ----------
+    item_id : str
+        Ítem de referencia.
+    rank : int
+        Posición del vecino, empezando en 1.
+    similar_id : str
+        Ítem similar.
+    score : float
+        Similitud coseno entre ambos ítems, en ``(0, 1]``.
+    """
+    __tablename__ = "item_similarity"
+
+    item_id: Mapped[str] = mapped_column(String, primary_key=True)
+    rank: Mapped[int] = mapped_column(Integer, primary_key=True)
+    similar_id: Mapped[str] = mapped_column(String, nullable=False)
+    score: Mapped[float] = mapped_column(Float, nullable=False)
+
+    def __repr__(self) -> str:
+        return f"<ItemSimilarity item_id={self.item_id!r} rank={self.rank!r} similar_id={self.similar_id!r}>"
+
+class ItemChange(Base):
+    """
+    Bitácora de cambios de ``items`` escrita por el cargador.
+
+    Cada fila insertada o modificada por una carga agrega una entrada con un
+    número de secuencia creciente; los consumidores guardan el último ``seq``
+    que vieron y piden sólo lo posterior (``GET /items/changes?since=``).
+
+    Attributes
+    ----------
+    seq : int
+        Número de secuencia, estrictamente creciente.
+    item_id : str
+        Ítem afectado.
+    op : str
+        ``insert`` o ``update``.
+    version : int
+        Versión del dataset en la que el cambio queda visible.
+    """
+    __tablename__ = "item_changes"
+
+    seq: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    item_id: Mapped[str] = mapped_column(String, nullable=False)
+    op: Mapped[str] = mapped_column(String, nullable=False)
+    version: Mapped[int] = mapped_column(Integer, nullable=False)
+
+    def __repr__(self) -> str:
+        return f"<ItemChange seq={self.seq!r} item_id={self.item_id!r} op={self.op!r}>"
+
+class Genre(Base):
+    """
+    Género del vocabulario controlado (ver ``etl.vocabulary``).
+
+    Attributes
+    ----------
+    id : int
+        Identificador estable del género.
+    name : str
+        Nombre canónico, en inglés y minúsculas (p.ej. ``horror``).
+    """
+    __tablename__ = "genres"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=False)
+    name: Mapped[str] = mapped_column(String, nullable=False, unique=True)
+
+    def __repr__(self) -> str:
+        return f"<Genre id={self.id!r} name={self.name!r}>"
+
+class GenreSynonym(Base):
+    """
+    Sinónimo (en español o inglés) de un género del vocabulario.
+
+    Attributes
+    ----------
+    term : str
+        Sinónimo normalizado: sin tildes, en minúsculas y con los espacios
+        colapsados (``etl.vocabulary.normalize_term``).
+    genre_id : int
+        Género al que corresponde.
+    """
+    __tablename__ = "genre_synonyms"
+
+    term: Mapped[str] = mapped_column(String, primary_key=True)
+    genre_id: Mapped[int] = mapped_column(Integer, nullable=False, index=True)
+
+    def __repr__(self) -> str:
+        return f"<GenreSynonym term={self.term!r} genre_id={self.genre_id!r}>"
+
+class ItemGenre(Base):
+    """
+    Géneros canónicos de cada ítem, calculados por el ETL a partir de
+    ``Item.genre``.
+
+    Vive en la misma base que ``items`` (en cada shard, si los hay). El índice
+    ``(genre_id, item_id)`` resuelve el filtro ``genre=`` de la API sin leer
+    la tabla.
+
+    Attributes
+    ----------
+    item_id : str
+        Ítem.
+    genre_id : int
+        Género del vocabulario.
+    """
+    __tablename__ = "item_genres"
+    __table_args__ = (Index("ix_item_genres_genre_item", "genre_id", "item_id"),)
+
+    item_id: Mapped[str] = mapped_column(String, primary_key=True)
+    genre_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+
+    def __repr__(self) -> str:
+        return f"<ItemGenre item_id={self.item_id!r} genre_id={self.genre_id!r}>"
+
+class Place(Base):
+    """
+    Nombre de lugar del gazetteer local (ver ``etl.gazetteer``).
+
+    Attributes
+    ----------
+    term : str
+        Nombre normalizado (sin tildes, en minúsculas), p.ej. ``bogota``.
+    code : str
+        Código ISO 3166-1 alfa-2 del país (``CO``) o M49 de la región (``419``).
+    region : str | None
+        Región M49 del país, o ``None`` si ``code`` ya es una región.
+    """
+    __tablename__ = "places"
+
+    term: Mapped[str] = mapped_column(String, primary_key=True)
+    code: Mapped[str] = mapped_column(String, nullable=False, index=True)
+    region: Mapped[str | None] = mapped_column(String)
+
+    def __repr__(self) -> str:
+        return f"<Place term={self.term!r} code={self.code!r}>"
+
+class ItemCountry(Base):
+    """
+    Códigos de país y región de cada ítem, resueltos por el ETL a partir de
+    ``Item.location``.
+
+    Igual que ``item_genres``, vive junto a ``items`` y su índice
+    ``(code, item_id)`` resuelve el filtro ``country=`` de la API.
+
+    Attributes
+    ----------
+    item_id : str
+        Ítem.
+    code : str
+        Código de país o región (ver :class:`Place`).
+    """
+    __tablename__ = "item_countries"
+    __table_args__ = (Index("ix_item_countries_code_item", "code", "item_id"),)
+
+    item_id: Mapped[str] = mapped_column(String, primary_key=True)
+    code: Mapped[str] = mapped_column(String, primary_key=True)
+
+    def __repr__(self) -> str:
+        return f"<ItemCountry item_id={self.item_id!r} code={self.code!r}>"
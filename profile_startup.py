@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Perfil del arranque en frío de la API.
+
+Importa ``api.main`` en un proceso limpio con ``python -X importtime`` y
+reporta el tiempo total de importación, los módulos más costosos (tiempo
+acumulado) y si se cargaron módulos que la API no debería necesitar al
+arrancar (el ETL, ``requests``) o si el engine se creó al importar.
+
+Uso::
+
+    python profile_startup.py
+    python profile_startup.py --top 30 --repeat 5
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+# Módulos que sólo usa ``/admin/refresh`` y que no deben importarse al arrancar.
+DEFERRED_MODULES = ("etl.load", "requests")
+
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import api.main
+elapsed = time.perf_counter() - start
+print(json.dumps({
+    "seconds": elapsed,
+    "modules": len(sys.modules),
+    "loaded": [m for m in %r if m in sys.modules],
+    "engine_created": api.main._engine is not None,
+}))
+"""
+
+
+def measure_import(importtime: bool = False) -> tuple[dict, str]:
+    """
+    Importa ``api.main`` en un subproceso y devuelve ``(resultado, stderr)``.
+
+    Con ``importtime`` el stderr contiene el reporte de ``-X importtime``.
+    """
+    cmd = [sys.executable]
+    if importtime:
+        cmd += ["-X", "importtime"]
+    cmd += ["-c", _PROBE % (DEFERRED_MODULES,)]
+    env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.abspath(__file__)))
+    proc = subprocess.run(cmd, capture_output=True, text=True, env=env, check=True)
+    return json.loads(proc.stdout.strip().splitlines()[-1]), proc.stderr
+
+
+def parse_importtime(report: str) -> list[tuple[int, int, str]]:
+    """Convierte las líneas ``import time: self | cumulative | name`` en tuplas (µs)."""
+    rows = []
+    for line in report.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        # El nombre va precedido de dos espacios por nivel de anidamiento.
+        rows.append((int(self_us), int(cumulative_us), name.rstrip()[1:]))
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--top", type=int, default=15, help="Módulos a listar por tiempo acumulado")
+    parser.add_argument("--repeat", type=int, default=3, help="Importaciones en frío para la mediana")
+    args = parser.parse_args()
+
+    timings = sorted(measure_import()[0]["seconds"] for _ in range(args.repeat))
+    result, report = measure_import(importtime=True)
+    rows = parse_importtime(report)
+
+    print(f"import api.main: mediana {timings[len(timings) // 2] * 1000:.1f} ms en {args.repeat} procesos")
+    print(f"módulos cargados: {result['modules']}")
+    print(f"engine creado al importar: {'sí' if result['engine_created'] else 'no'}")
+    print(f"módulos diferidos cargados: {', '.join(result['loaded']) or 'ninguno'}")
+    print()
+    print(f"{'acumulado (ms)':>15} {'propio (ms)':>12}  módulo")
+    # Importaciones directas (primer nivel de anidamiento), para no contar dos
+    # veces los submódulos dentro del acumulado de su paquete.
+    direct = [r for r in rows if r[2].startswith("  ") and not r[2].startswith("    ")]
+    for self_us, cumulative_us, name in sorted(direct, key=lambda r: -r[1])[:args.top]:
+        print(f"{cumulative_us / 1000:>15.1f} {self_us / 1000:>12.1f}  {name.strip()}")
+
+
+if __name__ == "__main__":
+    main()
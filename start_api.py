@@ -2,6 +2,7 @@
 """
 Script para iniciar la API REST para demostraciones
 """
+import logging
 import uvicorn
 import sys
 import os
@@ -13,6 +14,7 @@ sys.path.append('.')
 from api.main import app
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s:%(name)s:%(message)s")
     print("🚀 Iniciando API REST para demostraciones...")
     print("📡 URL: http://127.0.0.1:8003")
     print("📖 Documentación: http://127.0.0.1:8003/docs")
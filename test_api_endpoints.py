@@ -0,0 +1,817 @@
+#!/usr/bin/env python3
+"""
+Pruebas de los endpoints de la API usando ``TestClient`` sobre una base de
+datos SQLite temporal cargada con el conjunto de respaldo del ETL.
+"""
+import asyncio
+import csv
+import io
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+_DB_DIR = tempfile.mkdtemp(prefix="prueba-tecnica-")
+os.environ["DB_URL"] = f"sqlite:///{os.path.join(_DB_DIR, 'test.db')}"
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import OperationalError
+
+import agent.agent_simple as agent_simple
+import etl.load as etl_load
+import etl.shards as etl_shards
+from api.admission import AdmissionMiddleware, LaneConfig
+from api.cache import BloomFilter, SingleFlight
+from api.compression import negotiate
+from api.metrics import MetricsRegistry, instrument_engine
+from api.suggest import PrefixIndex
+from api.warmup import QueryLog
+from etl.gazetteer import canonical_places
+from etl.snapshot import current_snapshot
+from etl.vocabulary import SYNONYMS, canonical_genres
+from profile_startup import DEFERRED_MODULES, measure_import
+import api.main as api_main
+from api.main import app
+
+
+@pytest.fixture(scope="module")
+def client():
+    """Carga el dataset de respaldo vía ETL y devuelve un cliente de pruebas."""
+    original = etl_load.fetch_records
+    etl_load.fetch_records = etl_load._fallback_records
+    try:
+        etl_load.run()
+    finally:
+        etl_load.fetch_records = original
+    with TestClient(app) as c:
+        yield c
+
+
+def join_warmup() -> None:
+    if api_main._warmup_thread is not None:
+        api_main._warmup_thread.join()
+
+
+@pytest.fixture(autouse=True)
+def wait_for_warmup():
+    """El calentamiento corre en segundo plano: ninguna prueba deja uno en curso."""
+    yield
+    join_warmup()
+
+
+def test_fields_limits_list_response(client):
+    r = client.get("/items", params={"fields": "title,author", "limit": 3})
+    assert r.status_code == 200
+    for item in r.json():
+        assert set(item) == {"id", "title", "author"}
+
+
+def test_fields_on_item_detail(client):
+    r = client.get("/items", params={"fields": "id", "limit": 1})
+    item_id = r.json()[0]["id"]
+    r = client.get(f"/items/{item_id}", params={"fields": "date"})
+    assert r.status_code == 200
+    assert set(r.json()) == {"id", "date"}
+
+
+def test_fields_rejects_unknown_columns(client):
+    r = client.get("/items", params={"fields": "title,password"})
+    assert r.status_code == 422
+    assert "password" in r.json()["detail"]
+
+
+def test_batch_preserves_order_and_reports_missing(client):
+    ids = ["sample/picasso", "nope/1", "sample/it", "sample/picasso"]
+    r = client.post("/items/batch", json={"ids": ids})
+    assert r.status_code == 200
+    body = r.json()
+    assert [i["id"] for i in body["items"]] == ["sample/picasso", "sample/it"]
+    assert body["missing"] == ["nope/1"]
+
+
+def test_batch_rejects_empty_payload(client):
+    assert client.post("/items/batch", json={"ids": []}).status_code == 422
+
+
+def test_export_ndjson_streams_all_filtered_rows(client):
+    r = client.get("/items/export", params={"author": "García Márquez"})
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in r.text.splitlines()]
+    assert [i["id"] for i in lines] == ["sample/amor-colera", "sample/cronica"]
+
+
+def test_export_csv_has_header_and_requested_fields(client):
+    r = client.get("/items/export", params={"format": "csv", "fields": "title"})
+    assert r.status_code == 200
+    rows = list(csv.reader(io.StringIO(r.text)))
+    assert rows[0] == ["id", "title"]
+    assert len(rows) == 6
+
+
+def test_compression_negotiates_gzip_above_threshold(client):
+    r = client.get("/items", headers={"Accept-Encoding": "gzip"})
+    assert r.status_code == 200
+    assert r.headers["content-encoding"] == "gzip"
+    assert "accept-encoding" in r.headers["vary"].lower()
+    assert len(r.json()) == 5
+
+
+def test_compression_negotiates_brotli_when_installed(client):
+    pytest.importorskip("brotli")
+    r = client.get("/items", headers={"Accept-Encoding": "br, gzip;q=0.5"})
+    assert r.headers["content-encoding"] == "br"
+    # httpx decodifica ``br`` cuando ``brotli`` está instalado.
+    assert len(r.json()) == 5
+
+
+def test_compression_skips_small_or_refused_responses(client):
+    r = client.get("/items", params={"fields": "id", "limit": 1}, headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in r.headers
+    r = client.get("/items", headers={"Accept-Encoding": "gzip;q=0"})
+    assert "content-encoding" not in r.headers
+
+
+def test_negotiate_respects_quality_values():
+    assert negotiate("gzip;q=0.5, br", ["zstd", "br", "gzip"]) == "br"
+    assert negotiate("*", ["gzip"]) == "gzip"
+    assert negotiate("identity", ["gzip"]) is None
+
+
+def test_facets_count_filtered_result(client):
+    r = client.get("/items/facets", params={"author": "García Márquez", "top": 3})
+    assert r.status_code == 200
+    body = r.json()
+    assert body["author"] == [{"value": "Gabriel García Márquez", "count": 2}]
+    # Géneros canónicos y códigos de país, no el texto libre de las columnas.
+    assert {"value": "magical realism", "count": 2} in body["genre"]
+    assert {"value": "CO", "count": 2} in body["country"]
+    # ``location`` agrupa la columna, así que sus valores sirven en ``location=``.
+    assert {"value": "Caribe colombiano", "count": 1} in body["location"]
+    located = client.get("/items", params={"location": "Caribe colombiano"}).json()
+    assert [i["id"] for i in located] == ["sample/cronica"]
+    assert {d["value"] for d in body["decade"]} == {"1980s"}
+
+
+def test_facets_rejects_unknown_facet(client):
+    assert client.get("/items/facets", params={"facets": "color"}).status_code == 422
+
+
+def test_total_count_header_is_exact_and_cached(client):
+    r = client.get("/items", params={"author": "García Márquez", "limit": 1, "with_total": True})
+    assert r.headers["x-total-count"] == "2"
+    assert r.headers["x-total-count-exact"] == "true"
+    r = client.get("/items", params={"author": "García Márquez ", "fields": "id", "with_total": True})
+    assert r.headers["x-total-count"] == "2"
+    assert "x-total-count" not in client.get("/items").headers
+
+
+def test_total_count_uses_etl_stats_for_large_unfiltered_sets(client, monkeypatch):
+    monkeypatch.setattr(api_main, "COUNT_ESTIMATE_THRESHOLD", 1)
+    r = client.get("/items", params={"with_total": True})
+    assert r.headers["x-total-count"] == "5"
+    assert r.headers["x-total-count-exact"] == "false"
+
+
+def test_relevance_sort_ranks_by_bm25_and_ignores_accents(client):
+    r = client.get("/items", params={"q": "garcia marquez amor", "sort": "relevance"})
+    assert r.status_code == 200
+    ids = [i["id"] for i in r.json()]
+    assert ids[:2] == ["sample/amor-colera", "sample/cronica"]
+    assert "sample/it" not in ids
+
+
+def test_relevance_sort_counts_full_text_matches(client):
+    r = client.get("/items", params={"q": "capitalismo", "sort": "relevance", "with_total": True})
+    assert [i["id"] for i in r.json()] == ["sample/das-kapital"]
+    assert r.headers["x-total-count"] == "1"
+
+
+def test_year_backfill_uses_the_same_rule_as_the_loader():
+    engine = create_engine(f"sqlite:///{os.path.join(_DB_DIR, 'legacy.db')}")
+    dates = ["1985-03-01", "c. 1926", "19850", None]
+    with engine.begin() as conn:
+        conn.exec_driver_sql("CREATE TABLE items (id VARCHAR PRIMARY KEY, date VARCHAR)")
+        conn.exec_driver_sql("INSERT INTO items VALUES (?, ?)", [(str(n), d) for n, d in enumerate(dates)])
+    etl_load.ensure_schema(engine)
+    with engine.connect() as conn:
+        years = [y for (y,) in conn.exec_driver_sql("SELECT year FROM items ORDER BY id")]
+    # "c. 1926" sólo lo aceptaba derive_year y "19850" sólo el SQL anterior.
+    assert years == [etl_load.derive_year(d) for d in dates] == [1985, 1926, None, None]
+
+
+def test_relevance_sort_with_punctuation_only_q_falls_back_to_plain_search(client):
+    params = {"q": "!!!", "sort": "relevance"}
+    r = client.get("/items", params=params)
+    assert r.status_code == 200
+    assert r.json() == client.get("/items", params={"q": "!!!"}).json()
+    results = client.post("/query/batch", json={"queries": {"signos": {"kind": "items", **params}}}).json()["results"]
+    assert results["signos"] == {"status": 200, "data": r.json()}
+
+
+def test_relevance_sort_matches_locations_like_plain_search(client):
+    plain = [i["id"] for i in client.get("/items", params={"q": "caribe"}).json()]
+    ranked = [i["id"] for i in client.get("/items", params={"q": "caribe", "sort": "relevance"}).json()]
+    assert plain == ranked == ["sample/cronica"]
+
+
+def test_search_index_is_rebuilt_when_its_columns_change(client):
+    engine = api_main.get_engine()
+    with engine.begin() as conn:
+        for trigger in ("items_fts_ai", "items_fts_ad", "items_fts_au"):
+            conn.exec_driver_sql(f"DROP TRIGGER {trigger}")
+        conn.exec_driver_sql("DROP TABLE items_fts")
+        conn.exec_driver_sql(
+            "CREATE VIRTUAL TABLE items_fts USING fts5(title, author, summary, genre, content='items', "
+            "content_rowid='rowid')"
+        )
+    etl_load.ensure_search_index(engine)
+    with engine.connect() as conn:
+        columns = tuple(row[1] for row in conn.exec_driver_sql("PRAGMA table_info(items_fts)"))
+    assert columns == etl_load.SEARCH_INDEX_COLUMNS
+    assert [i["id"] for i in client.get("/items", params={"q": "caribe", "sort": "relevance"}).json()] == ["sample/cronica"]
+
+
+def test_year_range_and_decade_filters(client):
+    r = client.get("/items", params={"year_from": 1980, "year_to": 1985})
+    assert {i["id"] for i in r.json()} == {"sample/amor-colera", "sample/cronica"}
+    assert all(isinstance(i["year"], int) for i in r.json())
+    r = client.get("/items", params={"decade": 1980, "year_from": 1982})
+    assert {i["id"] for i in r.json()} == {"sample/amor-colera", "sample/it"}
+    r = client.get("/items/facets", params={"facets": "decade"})
+    assert {"value": "1980s", "count": 3} in r.json()["decade"]
+
+
+def test_metrics_exposes_route_latency_and_sql_time(client):
+    client.get("/items", params={"limit": 2})
+    client.get("/items/sample/it")
+    body = client.get("/metrics").text
+    assert 'api_requests_total{method="GET",route="/items",status="200"}' in body
+    assert 'api_request_duration_seconds_bucket{method="GET",route="/items/{item_id:path}",le="+Inf"}' in body
+    assert 'api_request_duration_quantile_seconds{method="GET",route="/items",quantile="0.99"}' in body
+    assert 'db_statements_total{route="/items"}' in body
+    assert "api_requests_in_flight" in body
+
+
+def test_sql_metrics_survive_failed_statements():
+    metrics = MetricsRegistry()
+    engine = create_engine("sqlite://")
+    instrument_engine(engine, metrics)
+    with engine.connect() as conn:
+        with pytest.raises(OperationalError):
+            conn.exec_driver_sql("SELECT * FROM no_existe")
+        conn.exec_driver_sql("SELECT 1")
+        # Nada queda pendiente en la conexión, que vuelve al pool.
+        assert not [k for k in conn.info if k.endswith("query_start")]
+    assert metrics.sql_statements.value(("background",)) == 1
+
+
+def test_slow_query_log_groups_by_shape_with_plan(client, monkeypatch):
+    monkeypatch.setattr(api_main.slow_query_log, "threshold_ms", 0)
+    headers = {"X-API-KEY": api_main.API_KEY}
+    client.delete("/admin/slow-queries", headers=headers)
+    client.get("/items", params={"author": "Marx"})
+    client.get("/items", params={"author": "King"})
+    report = client.get("/admin/slow-queries", headers=headers).json()
+    shape = next(s for s in report["shapes"] if "lower(items.author) LIKE" in s["shape"])
+    assert shape["count"] == 2
+    # Recorre items en el orden de ``id`` (índice de la clave primaria).
+    assert shape["plan"] == ["SCAN items USING INDEX sqlite_autoindex_items_1"]
+    assert shape["full_scan"] is True
+    assert client.get("/admin/slow-queries").status_code == 401
+
+
+def test_bloom_filter_has_no_false_negatives():
+    keys = [f"works/OL{n}W" for n in range(1000)]
+    bloom = BloomFilter.from_keys(keys, capacity=len(keys), error_rate=0.01)
+    assert all(k in bloom for k in keys)
+    false_positives = sum(f"works/OL{n}M" in bloom for n in range(10000))
+    assert false_positives < 300
+
+
+def test_point_lookups_skip_database_for_misses_and_hot_items(client):
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    client.get("/items/sample/it")
+    event.listen(api_main.get_engine(), "before_cursor_execute", record)
+    try:
+        assert client.get("/items/sample/it").json()["title"] == "It"
+        assert client.get("/items/works/OL404W").status_code == 404
+        batch = client.post("/items/batch", json={"ids": ["sample/it", "works/OL404W", "sample/it"]}).json()
+    finally:
+        event.remove(api_main.get_engine(), "before_cursor_execute", record)
+    assert statements == []
+    assert [i["id"] for i in batch["items"]] == ["sample/it"]
+    assert batch["missing"] == ["works/OL404W"]
+
+
+def test_query_batch_runs_named_subqueries_in_one_request(client):
+    payload = {"queries": {
+        "generos": {"kind": "genres", "top": 3},
+        "gabo": {"kind": "items", "author": "García", "fields": "title", "limit": 1},
+        "ids": {"kind": "item_ids", "ids": ["sample/it", "works/OL404W"]},
+        "malo": {"kind": "items", "fields": "isbn"},
+    }}
+    results = client.post("/query/batch", json=payload).json()["results"]
+    assert results["generos"]["data"] == client.get("/genres").json()[:3]
+    assert results["gabo"] == {"status": 200, "data": client.get("/items", params={"author": "García", "fields": "title", "limit": 1}).json()}
+    assert [i["id"] for i in results["ids"]["data"]["items"]] == ["sample/it"]
+    assert results["ids"]["data"]["missing"] == ["works/OL404W"]
+    assert results["malo"]["status"] == 422
+    assert client.post("/query/batch", json={"queries": {"x": {"kind": "nope"}}}).status_code == 422
+
+
+def test_query_batch_isolates_unexpected_subquery_errors(client, monkeypatch):
+    def broken(*args, **kwargs):
+        raise ValueError("fallo inesperado")
+
+    monkeypatch.setattr(api_main, "genre_counts", broken)
+    payload = {"queries": {"generos": {"kind": "genres"}, "ids": {"kind": "item_ids", "ids": ["sample/it"]}}}
+    response = client.post("/query/batch", json=payload)
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert results["generos"] == {"status": 500, "error": "Error interno al ejecutar la sub-consulta"}
+    assert [i["id"] for i in results["ids"]["data"]["items"]] == ["sample/it"]
+
+
+def test_similar_items_ranks_shared_author_and_genre_first(client):
+    similar = client.get("/items/sample/amor-colera/similar").json()
+    assert similar[0]["id"] == "sample/cronica"
+    assert all(0 < s["score"] <= 1 for s in similar)
+    assert [s["score"] for s in similar] == sorted((s["score"] for s in similar), reverse=True)
+    assert "sample/amor-colera" not in [s["id"] for s in similar]
+    assert len(client.get("/items/sample/amor-colera/similar", params={"limit": 1}).json()) == 1
+    assert client.get("/items/sample/no-existe/similar").status_code == 404
+
+
+def test_suggest_completes_word_prefixes_without_accents(client):
+    titles = client.get("/suggest", params={"prefix": "cronica"}).json()
+    assert titles[0]["value"].startswith("Crónica")
+    assert [s["value"] for s in client.get("/suggest", params={"prefix": "muer"}).json()] == [titles[0]["value"]]
+    authors = client.get("/suggest", params={"prefix": "garc", "field": "author"}).json()
+    assert authors[0] == {"value": "Gabriel García Márquez", "count": 2}
+    assert client.get("/suggest", params={"prefix": "x", "field": "summary"}).status_code == 422
+
+
+def test_prefix_index_ranks_leading_matches_then_frequency():
+    index = PrefixIndex(["Amor y guerra", "El amor", "El amor", "Amanecer"])
+    assert index.complete("am") == [("Amanecer", 1), ("Amor y guerra", 1), ("El amor", 2)]
+    assert index.complete("AMO", limit=1) == [("Amor y guerra", 1)]
+    assert index.complete("  ") == []
+    # Los prefijos cortos salen de listas precalculadas, con el mismo orden que el recorrido.
+    assert [index.values[n] for n in index._rank("a", 10)] == [v for v, _ in index.complete("a")]
+    small = PrefixIndex(["Amor y guerra", "El amor", "El amor", "Amanecer"], top_k=1)
+    assert small.complete("a", limit=3) == index.complete("a", limit=3)
+
+
+def test_cold_import_defers_etl_and_engine():
+    result, _ = measure_import()
+    assert result["loaded"] == [], f"{DEFERRED_MODULES} no deberían importarse al arrancar"
+    assert result["engine_created"] is False
+    assert result["seconds"] < float(os.getenv("STARTUP_BUDGET_SECONDS", "5"))
+
+
+def test_admission_sheds_overflow_without_blocking_lookups():
+    async def scenario():
+        gate = asyncio.Event()
+
+        async def slow_app(scope, receive, send):
+            if scope["path"] == "/items":
+                await gate.wait()
+            await send({"type": "http.response.start", "status": 200, "headers": []})
+            await send({"type": "http.response.body", "body": b"ok"})
+
+        rejected = []
+        middleware = AdmissionMiddleware(
+            slow_app, api_main.admission_lane, lanes={"search": LaneConfig(1, 1, 5.0)},
+            default=LaneConfig(4, 4, 5.0), retry_after=3, on_reject=rejected.append,
+        )
+
+        async def call(path):
+            messages = []
+
+            async def send(message):
+                messages.append(message)
+
+            await middleware({"type": "http", "method": "GET", "path": path}, None, send)
+            return messages[0]["status"], dict(messages[0]["headers"])
+
+        running = asyncio.ensure_future(call("/items"))
+        queued = asyncio.ensure_future(call("/items"))
+        await asyncio.sleep(0)
+        shed_status, shed_headers = await call("/items")
+        lookup_status, _ = await call("/items/sample/it")
+        gate.set()
+        return shed_status, shed_headers, lookup_status, await running, await queued, rejected
+
+    shed_status, shed_headers, lookup_status, running, queued, rejected = asyncio.run(scenario())
+    assert (shed_status, shed_headers[b"retry-after"]) == (503, b"3")
+    assert lookup_status == 200
+    assert running[0] == queued[0] == 200
+    assert rejected == ["search"]
+
+
+@pytest.mark.parametrize("params", [
+    {},
+    {"q": "amor"},
+    {"q": "colombia"},
+    {"author": "garcía", "type": "book"},
+    {"genre": "FICTION", "year_from": 1900},
+    {"decade": 1980, "location": "colomb"},
+    {"country": "CO"},
+    {"type": "report"},
+    {"limit": 2, "offset": 1},
+    {"decade": 1980, "limit": 1},
+    {"year_from": 1800, "limit": 2},
+])
+def test_memory_store_matches_database_results(client, monkeypatch, params):
+    expected = client.get("/items", params={**params, "with_total": True})
+    # Registrar ``memory_store`` antes de cargarlo para que el teardown lo deje en None.
+    monkeypatch.setattr(api_main, "memory_store", None)
+    monkeypatch.setattr(api_main, "SERVING_MODE", "memory")
+    api_main.reload_memory_store()
+    actual = client.get("/items", params={**params, "with_total": True})
+    assert actual.json() == expected.json()
+    assert actual.headers["x-total-count"] == expected.headers["x-total-count"]
+
+
+def test_ingest_ndjson_upserts_in_batches_and_reports_errors(client, monkeypatch):
+    monkeypatch.setattr(api_main, "INGEST_BATCH_SIZE", 2)
+    lines = [
+        {"id": "partner/1", "title": "Cien años de soledad", "date": "1967", "author": "Gabriel García Márquez"},
+        {"id": "partner/2"},
+        "no es json",
+        {"id": "partner/3", "title": "Rayuela", "year": 1963},
+        {"id": "partner/1", "title": "Cien años de soledad (ed. 2)", "date": "1967"},
+    ]
+    body = "\n".join(line if isinstance(line, str) else json.dumps(line) for line in lines) + "\n\n"
+    before = api_main.current_dataset_version()
+
+    def chunks():
+        # Cortes arbitrarios: las líneas llegan partidas entre fragmentos.
+        data = body.encode()
+        for i in range(0, len(data), 7):
+            yield data[i:i + 7]
+
+    try:
+        assert client.post("/admin/items", content=chunks()).status_code == 401
+        response = client.post("/admin/items", content=chunks(), headers={"X-API-KEY": api_main.API_KEY})
+        assert response.status_code == 200
+        report = response.json()
+        assert (report["received"], report["upserted"], report["rejected"]) == (5, 3, 2)
+        assert report["version"] == before + 1
+        assert [(b["received"], b["upserted"]) for b in report["batches"]] == [(2, 1), (2, 1), (1, 1)]
+        assert [e["line"] for e in report["batches"][0]["errors"]] == [2]
+        assert report["batches"][0]["errors"][0]["error"].startswith("title:")
+        item = client.get("/items/partner/1").json()
+        assert (item["title"], item["year"], item["author"]) == ("Cien años de soledad (ed. 2)", 1967, None)
+        assert client.get("/items", params={"q": "rayuela", "sort": "relevance"}).json()[0]["id"] == "partner/3"
+    finally:
+        with api_main.Session(api_main.get_engine()) as session:
+            session.execute(api_main.text("DELETE FROM items WHERE id LIKE 'partner/%'"))
+            session.commit()
+        api_main.notify_dataset_changed()
+
+
+def test_ingest_refreshes_similarity_of_affected_items_only(client):
+    from etl.similarity import item_vectors, nearest_neighbors, rebuild_similarity
+    from models_shared import ItemSimilarity
+
+    headers = {"X-API-KEY": api_main.API_KEY}
+    assert client.post("/admin/refresh").status_code == 401
+    untouched = client.get("/items/sample/picasso/similar").json()
+    line = {"id": "partner/amor", "title": "Amor y cólera", "date": "1990", "author": "Gabriel García Márquez"}
+    try:
+        assert client.post("/admin/items", content=json.dumps(line), headers=headers).status_code == 200
+        assert "partner/amor" in [s["id"] for s in client.get("/items/sample/amor-colera/similar").json()]
+        # Las listas recalculadas coinciden con una reconstrucción completa.
+        with api_main.Session(api_main.get_engine()) as session:
+            vectors = item_vectors(session)
+            for item_id in ("partner/amor", "sample/amor-colera", "sample/cronica"):
+                stored = session.execute(
+                    api_main.select(ItemSimilarity.similar_id, ItemSimilarity.score)
+                    .where(ItemSimilarity.item_id == item_id).order_by(ItemSimilarity.rank)
+                ).all()
+                (_, best), = nearest_neighbors(vectors, items=[item_id])
+                assert [(other, round(score, 6)) for other, score in best] == [tuple(r) for r in stored]
+        assert client.get("/items/sample/picasso/similar").json() == untouched
+    finally:
+        with api_main.Session(api_main.get_engine()) as session:
+            session.execute(api_main.text("DELETE FROM items WHERE id LIKE 'partner/%'"))
+            rebuild_similarity(session)
+            session.commit()
+        api_main.notify_dataset_changed()
+
+
+def test_sharded_backend_matches_single_database(client, monkeypatch):
+    queries = [
+        {}, {"q": "amor"}, {"author": "garcía", "with_total": True}, {"decade": 1980},
+        {"decade": 1980, "limit": 1}, {"year_from": 1800, "limit": 2, "offset": 1},
+    ]
+    expected = [client.get("/items", params=p).json() for p in queries]
+    expected_page = client.get("/items").json()[1:3]
+    expected_facets = client.get("/items/facets").json()
+    expected_genres = client.get("/genres").json()
+    expected_export = client.get("/items/export").text.splitlines()
+
+    urls = [f"sqlite:///{os.path.join(_DB_DIR, f'shard{i}.db')}" for i in range(3)]
+    monkeypatch.setenv("SHARD_URLS", ",".join(urls))
+    shard_snapshots = os.path.join(_DB_DIR, "shard-snapshots")
+    monkeypatch.setenv("SNAPSHOT_DIR", shard_snapshots)
+    monkeypatch.setattr(etl_load, "fetch_records", etl_load._fallback_records)
+    etl_load.run()
+    assert current_snapshot(shard_snapshots) is not None
+    engines = [api_main._create_engine(url) for url in urls]
+    monkeypatch.setattr(api_main, "_shard_engines", engines)
+    monkeypatch.setattr(api_main, "_shard_pool", ThreadPoolExecutor(max_workers=3))
+    api_main.notify_dataset_changed()
+    join_warmup()
+    try:
+        for params, items in zip(queries, expected):
+            assert client.get("/items", params=params).json() == items
+        response = client.get("/items", params={"limit": 2, "offset": 1, "with_total": True})
+        assert response.json() == expected_page
+        assert response.headers["x-total-count"] == "5"
+        assert client.get("/items/facets").json() == expected_facets
+        assert sorted(map(tuple, (g.values() for g in client.get("/genres").json()))) == sorted(
+            map(tuple, (g.values() for g in expected_genres))
+        )
+        assert client.get("/items/export").text.splitlines() == expected_export
+        assert client.get("/items", params={"q": "amor", "sort": "relevance"}).json()[0]["id"] == "sample/amor-colera"
+
+        touched = []
+        for n, engine in enumerate(engines):
+            event.listen(engine, "before_cursor_execute", lambda *args, n=n: touched.append(n))
+        assert client.get("/items/sample/it", params={"fields": "title"}).json()["title"] == "It"
+        assert touched == [etl_shards.shard_index("sample/it", 3)]
+    finally:
+        monkeypatch.undo()
+        api_main.notify_dataset_changed()
+
+
+def test_snapshot_mode_reads_read_only_file_and_swaps_on_publish(client, monkeypatch):
+    # Espacios, ``?`` y ``#`` en la ruta no deben romper la URI del snapshot.
+    snapshot_dir = os.path.join(_DB_DIR, "snap shots?#1")
+    first = api_main.publish_snapshot(api_main.DB_URL, snapshot_dir)
+    monkeypatch.setattr(api_main, "SNAPSHOT_DIR", snapshot_dir)
+    monkeypatch.setattr(api_main, "_engine", None)
+    monkeypatch.setattr(api_main, "_snapshot_path", None)
+    monkeypatch.setattr(api_main, "_write_engine", None)
+    api_main.notify_dataset_changed()
+    try:
+        engine = api_main.get_engine()
+        assert "mode=ro" in str(engine.url) and "immutable=1" in str(engine.url)
+        assert api_main._snapshot_path == first
+        with engine.connect() as conn:
+            assert conn.exec_driver_sql("PRAGMA mmap_size").scalar() == api_main.SNAPSHOT_MMAP_BYTES
+            with pytest.raises(api_main.OperationalError, match="readonly"):
+                conn.exec_driver_sql("DELETE FROM items")
+        assert client.get("/items/sample/it").json()["title"] == "It"
+
+        line = json.dumps({"id": "partner/snap", "title": "Snapshot"}).encode()
+        response = client.post("/admin/items", content=line, headers={"X-API-KEY": api_main.API_KEY})
+        assert response.json()["upserted"] == 1
+        assert api_main._snapshot_path not in (None, first)
+        assert client.get("/items/partner/snap").json()["title"] == "Snapshot"
+        assert not api_main.reload_snapshot()
+    finally:
+        with api_main.Session(api_main.get_write_engine()) as session:
+            session.execute(api_main.text("DELETE FROM items WHERE id LIKE 'partner/%'"))
+            session.commit()
+        api_main.get_engine().dispose()
+        monkeypatch.undo()
+        api_main.notify_dataset_changed()
+
+
+def test_change_feed_streams_only_rows_changed_since_cursor(client):
+    def changes(**params):
+        response = client.get("/items/changes", params=params)
+        assert response.headers["content-type"] == "application/x-ndjson"
+        return response, [json.loads(line) for line in response.text.splitlines()]
+
+    response, log = changes()
+    head = int(response.headers["x-change-seq"])
+    assert head == log[-1]["seq"] and [c["seq"] for c in log] == sorted(c["seq"] for c in log)
+    assert {"id": "sample/it", "op": "insert"}.items() <= next(c for c in log if c["id"] == "sample/it").items()
+
+    unchanged = client.get("/items/sample/it").json()
+    original = client.get("/items/sample/cronica").json()
+    lines = [unchanged, {**original, "title": "Crónica (revisada)"}, {"id": "partner/feed", "title": "Nuevo"}]
+    headers = {"X-API-KEY": api_main.API_KEY}
+    try:
+        response = client.post("/admin/items", content="\n".join(map(json.dumps, lines)), headers=headers)
+        version = response.json()["version"]
+        response, delta = changes(since=head)
+        assert [(c["id"], c["op"], c["version"]) for c in delta] == [
+            ("sample/cronica", "update", version),
+            ("partner/feed", "insert", version),
+        ]
+        assert int(response.headers["x-change-seq"]) == delta[-1]["seq"] > head
+        # Con ``limit`` menor que lo pendiente, el header es el cursor de la
+        # página y recorrerlo no salta ningún cambio.
+        response, page = changes(since=head, limit=1)
+        assert page == delta[:1] and int(response.headers["x-change-seq"]) == delta[0]["seq"]
+        response, rest = changes(since=int(response.headers["x-change-seq"]), limit=1)
+        assert rest == delta[1:] and int(response.headers["x-change-seq"]) == delta[1]["seq"]
+        response, empty = changes(since=delta[-1]["seq"])
+        assert empty == [] and int(response.headers["x-change-seq"]) == delta[-1]["seq"]
+    finally:
+        client.post("/admin/items", content=json.dumps(original), headers=headers)
+        with api_main.Session(api_main.get_engine()) as session:
+            session.execute(api_main.text("DELETE FROM items WHERE id LIKE 'partner/%'"))
+            session.commit()
+        api_main.notify_dataset_changed()
+
+
+def test_query_log_normalizes_shapes_and_persists_frequencies(tmp_path):
+    log = QueryLog(max_shapes=4)
+    log.record("/items", "limit=5&genre=fiction")
+    log.record("/items", "genre=fiction&q=&limit=5")
+    log.record("/items", "genre=%20fiction%20&limit=5")
+    for n in range(4):
+        log.record(f"/items/sample/{n}", "")
+    assert log.top(1) == [("/items", "genre=fiction&limit=5")]
+    assert len(log.counts) <= 4
+
+    path = str(tmp_path / "queries.json")
+    log.save(path)
+    restored = QueryLog()
+    restored.load(path)
+    restored.load(str(tmp_path / "missing.json"))
+    assert restored.counts == log.counts
+
+
+def test_frequent_queries_are_replayed_after_dataset_change(client, monkeypatch):
+    api_main.query_log.counts.clear()
+    for _ in range(3):
+        client.get("/items", params={"genre": "fiction", "with_total": True, "limit": 5})
+    client.get("/items/sample/it")
+    client.get("/items/no-existe")
+    client.get("/items/export")
+    assert set(api_main.query_log.top(10)) == {
+        ("/items", "genre=fiction&limit=5&with_total=true"),
+        ("/items/sample/it", ""),
+    }
+
+    statements = []
+    engine = api_main.get_engine()
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        api_main.count_cache.clear()
+        api_main.notify_dataset_changed()
+        api_main._warmup_thread.join()
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+    version = api_main._seen_dataset_version
+    assert api_main.item_cache.get((version, "sample/it")) is not None
+    assert len(api_main.count_cache) == 1
+    assert any("LIMIT" in s for s in statements)
+
+    monkeypatch.setattr(api_main, "WARMUP_TOP", 0)
+    api_main.count_cache.clear()
+    api_main.notify_dataset_changed()
+    assert len(api_main.count_cache) == 0
+
+
+def test_warmup_runs_in_background_and_logs_http_errors_without_traceback(client, monkeypatch, caplog):
+    release = threading.Event()
+    replay = api_main.replay
+
+    async def slow_replay(app, shapes):
+        release.wait(5)
+        return await replay(app, shapes)
+
+    monkeypatch.setattr(api_main, "replay", slow_replay)
+    monkeypatch.setattr(api_main.query_log, "top", lambda n: [("/items/no-existe", "")])
+    with caplog.at_level(logging.INFO, logger="api.warmup"):
+        # El cambio del dataset no espera a las repeticiones.
+        api_main.notify_dataset_changed()
+        assert api_main._warmup_thread.is_alive()
+        release.set()
+        api_main._warmup_thread.join(5)
+    record = next(r for r in caplog.records if "no-existe" in r.getMessage())
+    assert record.levelno == logging.INFO and record.exc_info is None
+
+
+def test_single_flight_shares_one_execution_and_errors():
+    flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def work():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return ["resultado"]
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        leader = pool.submit(flight.do, "k", work)
+        assert started.wait(5)
+        followers = [pool.submit(flight.do, "k", work) for _ in range(3)]
+        deadline = time.monotonic() + 5
+        while flight._flights["k"].waiters < 3 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        release.set()
+        assert leader.result() == (["resultado"], False)
+        assert [f.result() for f in followers] == [(leader.result()[0], True)] * 3
+    assert len(calls) == 1 and not flight._flights
+    assert flight.do("k", lambda: 2) == (2, False)
+    with pytest.raises(ZeroDivisionError):
+        flight.do("k", lambda: 1 / 0)
+
+
+def test_concurrent_identical_genre_requests_run_one_query(client, monkeypatch):
+    original = api_main._genre_counts
+    release = threading.Event()
+    calls = []
+
+    def slow_genre_counts(session, top):
+        calls.append(top)
+        release.wait(5)
+        return original(session, top)
+
+    monkeypatch.setattr(api_main, "_genre_counts", slow_genre_counts)
+    key = ("/genres", (200,), api_main._seen_dataset_version)
+    shared = api_main.metrics_registry.flight_shared
+    before = shared._values.get(("/genres",), 0)
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        responses = [pool.submit(client.get, "/genres") for _ in range(3)]
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline:
+            flight = api_main.single_flight._flights.get(key)
+            if flight is not None and flight.waiters == 2:
+                break
+            time.sleep(0.01)
+        release.set()
+        bodies = [r.result().json() for r in responses]
+    assert len(calls) == 1
+    assert bodies[0] == bodies[1] == bodies[2] and bodies[0]
+    assert shared._values[("/genres",)] == before + 2
+    assert 'singleflight_shared_total{route="/genres"}' in client.get("/metrics").text
+
+
+def test_genre_synonyms_resolve_to_one_canonical_genre(client):
+    assert canonical_genres("Horror fiction, Colombia -- Historia, Spanish language books") == [
+        SYNONYMS["horror"], SYNONYMS["history"],
+    ]
+    vocabulary = {g["name"]: g["synonyms"] for g in client.get("/genres/vocabulary").json()}
+    assert {"terror", "horror fiction"} <= set(vocabulary["horror"])
+
+    def ids(genre):
+        return [i["id"] for i in client.get("/items", params={"genre": genre}).json()]
+
+    assert ids("terror") == ids("Horror fiction") == ids("HORROR") == ["sample/it"]
+    assert ids("crimen") == ["sample/cronica"]
+    assert ids("biografía") == ids("biography") == ["sample/picasso"]
+    # Un tema fuera del vocabulario sigue filtrando por subcadena.
+    assert sorted(ids("realismo")) == ["sample/amor-colera", "sample/cronica"]
+
+
+def test_agent_detects_genres_from_api_vocabulary(client, monkeypatch):
+    monkeypatch.setattr(agent_simple.requests, "get", lambda url, **kw: client.get(url, params=kw.get("params")))
+    agent = agent_simple.Agent("")
+    interpretation = agent.interpret("busca libros de ciencia ficción y de terror")
+    assert interpretation["params"]["genre"] == "science fiction"
+    result = agent.call_api("search", {"q": "Terror"})
+    assert [item["id"] for item in result["data"]] == ["sample/it"]
+    # Fuera del vocabulario se conserva la aproximación sobre /genres.
+    result = agent.call_api("search", {"genre": "filosofja"})
+    assert [item["id"] for item in result["data"]] == ["sample/das-kapital"]
+    result = agent.call_api("search", {"q": "zzzz"})
+    assert "No encontré el género 'zzzz'" in agent.format_response(result, "zzzz")
+
+
+def test_locations_resolve_to_country_codes(client):
+    assert canonical_places("Bogotá (Colombia), Colombia -- History, Atlántida") == ["CO", "419"]
+    assert canonical_places("Caribbean Area, Estados Unidos") == ["419", "US", "021"]
+    countries = {c["code"]: c for c in client.get("/countries").json()}
+    assert countries["CO"]["count"] == 2 and "caribe colombiano" in countries["CO"]["places"]
+
+    def ids(country):
+        return sorted(i["id"] for i in client.get("/items", params={"country": country}).json())
+
+    assert ids("CO") == ids("colombia") == ids("Bogotá") == ["sample/amor-colera", "sample/cronica"]
+    assert ids("150") == ["sample/das-kapital", "sample/picasso"]
+    assert ids("ZZ") == []
+
+
+def test_agent_detects_countries_from_api_gazetteer(client, monkeypatch):
+    monkeypatch.setattr(agent_simple.requests, "get", lambda url, **kw: client.get(url, params=kw.get("params")))
+    agent = agent_simple.Agent("")
+    params = agent.interpret("muestra libros sobre Colombia")["params"]
+    assert params == {"type": "book", "country": "CO"}
+    result = agent.call_api("search", params)
+    assert sorted(item["id"] for item in result["data"]) == ["sample/amor-colera", "sample/cronica"]
+    assert agent.interpret("libros publicados en la India")["params"]["country"] == "IN"
+    # Sin preposición de lugar, los alias ambiguos siguen siendo palabras.
+    for query in ("qué libros usa Gabriel", "busca Roma", "busca lima limón", "los andes del sur"):
+        assert "country" not in agent.interpret(query)["params"], query